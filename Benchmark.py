@@ -0,0 +1,303 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import json
+import time
+import random
+import resource
+import argparse
+import subprocess
+import SteamGamesScraper as scraper
+from SteamDatabase import WriteJSONObject
+from StreamJSON import LoadKeys
+from GameRecords import CompactDataset
+
+DEFAULT_FOLDER  = 'benchmark'
+DEFAULT_REPEAT  = 3
+SCALES          = [1000, 10000, 150000]
+MICRO_LIMIT     = 5000 # Payloads used by the benchmarks of functions
+SEED            = 1234
+WORDS = ('game world player story combat explore unique adventure level craft survive battle mode online friends '
+         'quest dungeon boss weapon skill upgrade puzzle strategy build city space ship magic dark ancient hero').split()
+TAGS = ['Indie', 'Action', 'Adventure', 'Casual', 'Simulation', 'Strategy', 'RPG', 'Singleplayer', 'Early Access',
+        'Free to Play', '2D', 'Atmospheric', 'Puzzle', 'Story Rich', 'Multiplayer', 'Pixel Graphics', 'Colorful',
+        'Exploration', 'First-Person', 'Fantasy', 'Horror', 'Sci-fi', 'Survival', 'Open World', 'Sports', 'Racing']
+LANGUAGES = ['English', 'French', 'Italian', 'German', 'Spanish - Spain', 'Japanese', 'Korean', 'Russian',
+             'Simplified Chinese', 'Traditional Chinese', 'Portuguese - Brazil', 'Polish', 'Turkish']
+PRICES = ['${0}.{1:02d}', '{0},{1:02d}€', '£{0}.{1:02d}', 'R$ {0},{1:02d}', '{0},{1:02d} pуб.', 'CDN$ {0}.{1:02d}']
+
+def Sentence(rng, words):
+  return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def Description(rng, paragraphs):
+  '''
+  HTML description like the ones of the Steam store: headers, lists, images, links and entities.
+  '''
+  html = []
+  for index in range(paragraphs):
+    html.append(f'<h2 class="bb_tag">{Sentence(rng, 3)}</h2>')
+    html.append(f'<p class="bb_paragraph">{" ".join(Sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 5)))}</p>')
+    html.append(f'<img class="bb_img" src="https://shared.akamai.steamstatic.com/store_item_assets/steam/apps/{index}/extras/{rng.randint(0, 10**8):x}.gif?t=1700000000" />')
+    html.append('<ul class="bb_ul">' + ''.join(f'<li>{Sentence(rng, 6)}<br></li>' for _ in range(rng.randint(2, 6))) + '</ul>')
+    html.append(f'<a href="https://steamcommunity.com/linkfilter/?u=https%3A%2F%2Fexample.com%2F{index}" target="_blank" rel=" noopener">&quot;{Sentence(rng, 2)}&quot;</a>\r\n')
+
+  return ''.join(html)
+
+def Payload(appID, rng):
+  '''
+  Synthetic appdetails data of a released game.
+  '''
+  free = rng.random() < 0.15
+  cents = rng.choice([99, 499, 999, 1499, 1999, 2999, 5999])
+  languages = rng.sample(LANGUAGES, rng.randint(1, len(LANGUAGES)))
+  app = {
+    'type': 'game',
+    'name': f' {Sentence(rng, rng.randint(1, 4))[:-1]} ',
+    'steam_appid': appID,
+    'required_age': rng.choice([0, 0, 0, '16', '18+']),
+    'is_free': free,
+    'dlc': [appID + i for i in range(rng.randint(0, 5))],
+    'detailed_description': Description(rng, rng.randint(2, 8)),
+    'about_the_game': Description(rng, rng.randint(1, 6)),
+    'short_description': Sentence(rng, 25),
+    'supported_languages': ', '.join(f'{language}<strong>*</strong>' if rng.random() < 0.4 else language for language in languages) +
+                           '<br><strong>*</strong>languages with full audio support',
+    'reviews': f'“{Sentence(rng, 10)}”<br>9/10 – <a href="https://example.com/review" target="_blank">Review</a><br>',
+    'header_image': f'https://shared.akamai.steamstatic.com/store_item_assets/steam/apps/{appID}/header.jpg?t=1700000000',
+    'website': f'https://www.example{appID}.com',
+    'support_info': {'url': f'https://support.example{appID}.com', 'email': f'support@example{appID}.com'},
+    'developers': [f'Studio {rng.randint(0, 20000)}' for _ in range(rng.randint(1, 2))],
+    'publishers': [f'Publisher {rng.randint(0, 5000)}'],
+    'platforms': {'windows': True, 'mac': rng.random() < 0.3, 'linux': rng.random() < 0.2},
+    'categories': [{'id': i, 'description': TAGS[i]} for i in rng.sample(range(len(TAGS)), rng.randint(1, 8))],
+    'genres': [{'id': str(i), 'description': TAGS[i]} for i in rng.sample(range(7), rng.randint(1, 3))],
+    'screenshots': [{'id': i, 'path_full': f'https://shared.akamai.steamstatic.com/store_item_assets/steam/apps/{appID}/ss_{rng.randint(0, 10**12):x}.1920x1080.jpg?t=1700000000'} for i in range(rng.randint(3, 20))],
+    'movies': [{'id': i, 'mp4': {'max': f'http://video.akamai.steamstatic.com/store_trailers/{appID}/movie_max.mp4?t=1700000000'}} for i in range(rng.randint(0, 4))],
+    'recommendations': {'total': rng.randint(0, 500000)},
+    'achievements': {'total': rng.randint(0, 200)},
+    'release_date': {'coming_soon': False, 'date': f"{rng.choice(['Jan', 'Feb', 'Mar', 'Oct', 'Nov', 'Dec'])} {rng.randint(1, 28)}, {rng.randint(2005, 2025)}"},
+    'content_descriptors': {'ids': [], 'notes': Sentence(rng, 12) if rng.random() < 0.2 else None},
+    'package_groups': [],
+  }
+  if rng.random() < 0.2:
+    app['metacritic'] = {'score': rng.randint(40, 95), 'url': f'https://www.metacritic.com/game/pc/{appID}'}
+  if not free:
+    app['price_overview'] = {'currency': 'USD', 'initial': cents, 'final': cents, 'discount_percent': 0,
+                             'initial_formatted': '', 'final_formatted': rng.choice(PRICES).format(cents // 100, cents % 100)}
+  for group in range(rng.randint(0 if free else 1, 6)):
+    app['package_groups'].append({
+      'name': 'default', 'title': f'Buy {app["name"].strip()} <span class="discount">&quot;Edition {group}&quot;</span>',
+      'description': Sentence(rng, 10) if rng.random() < 0.3 else '',
+      'subs': [{'packageid': rng.randint(0, 10**6), 'option_text': f'{Sentence(rng, 3)} - <span class="discount_original_price">$19.99</span> $9.99',
+                'option_description': '', 'price_in_cents_with_discount': rng.randint(0, 9999)} for _ in range(rng.randint(1, 8))]})
+
+  return app
+
+def Game(appID, rng):
+  '''
+  Synthetic game of the dataset, with the SteamSpy info.
+  '''
+  game = scraper.ParseSteamGame(Payload(appID, rng))
+  game['fetched'] = 1700000000 + appID
+  scraper.AddSteamSpyInfo(game, {
+    'userscore': 0, 'score_rank': '', 'positive': rng.randint(0, 10**6), 'negative': rng.randint(0, 10**5),
+    'owners': rng.choice(['0 .. 20,000', '20,000 .. 50,000', '1,000,000 .. 2,000,000']),
+    'average_forever': rng.randint(0, 10**4), 'average_2weeks': rng.randint(0, 10**3), 'median_forever': rng.randint(0, 10**4),
+    'median_2weeks': rng.randint(0, 10**3), 'discount': rng.choice(['0', '0', '50']), 'ccu': rng.randint(0, 10**5),
+    'tags': {tag: rng.randint(1, 5000) for tag in rng.sample(TAGS, rng.randint(5, 20))}})
+
+  return game
+
+def Payloads(count):
+  rng = random.Random(SEED)
+  return [Payload(10 + appID * 10, rng) for appID in range(count)]
+
+def Dataset(scale, folder):
+  '''
+  Name of the synthetic games.json with 'scale' games. It is generated the first time, always the same.
+  '''
+  filename = os.path.join(folder, f'games_{scale}.json')
+  if not os.path.exists(filename):
+    os.makedirs(folder, exist_ok=True)
+    scraper.Log(scraper.INFO, f"Generating '{filename}'")
+    rng = random.Random(SEED)
+    WriteJSONObject(((str(10 + appID * 10), Game(10 + appID * 10, rng)) for appID in range(scale)), filename + '.tmp')
+    os.replace(filename + '.tmp', filename)
+
+  return filename
+
+def Measure(function, ops, repeat):
+  '''
+  Best time of 'repeat' runs of a function that does 'ops' operations.
+  '''
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    best = min(best, time.perf_counter() - start)
+
+  return {'ops': ops, 'seconds': round(best, 4), 'ops_per_sec': round(ops / best, 1) if best > 0 else 0.0}
+
+def BenchSanitize(scale, folder, repeat):
+  texts = []
+  for app in Payloads(min(scale, MICRO_LIMIT)):
+    texts += [app['detailed_description'], app['about_the_game'], app['short_description'], app['reviews']]
+
+  return Measure(lambda: [scraper.SanitizeText(text) for text in texts], len(texts), repeat)
+
+def BenchPrice(scale, folder, repeat):
+  prices = [app['price_overview']['final_formatted'] for app in Payloads(min(scale, MICRO_LIMIT)) if 'price_overview' in app]
+
+  return Measure(lambda: [scraper.PriceToFloat(price) for price in prices], len(prices), repeat)
+
+def BenchParse(scale, folder, repeat):
+  payloads = Payloads(min(scale, MICRO_LIMIT))
+
+  return Measure(lambda: [scraper.ParseSteamGame(app) for app in payloads], len(payloads), repeat)
+
+def BenchLoad(scale, folder, repeat):
+  filename = Dataset(scale, folder)
+
+  return Measure(lambda: scraper.LoadJSON(filename), scale, repeat)
+
+def BenchLoadCompact(scale, folder, repeat):
+  filename = Dataset(scale, folder)
+
+  return Measure(lambda: scraper.LoadJSON(filename, CompactDataset), scale, repeat)
+
+def BenchLoadKeys(scale, folder, repeat):
+  filename = Dataset(scale, folder)
+
+  return Measure(lambda: LoadKeys(filename), scale, repeat)
+
+def BenchSave(scale, folder, repeat, factory=dict):
+  dataset = scraper.LoadJSON(Dataset(scale, folder), factory)
+  filename = os.path.join(folder, 'save.json')
+  result = Measure(lambda: scraper.SaveJSON(dataset, filename), scale, repeat)
+  os.remove(filename)
+
+  return result
+
+def BenchSaveCompact(scale, folder, repeat):
+  return BenchSave(scale, folder, repeat, CompactDataset)
+
+def BenchConvert(scale, folder, repeat):
+  '''
+  ConvertToCSV.py is a script, it is run in another process.
+  '''
+  filename = os.path.abspath(Dataset(scale, folder))
+  script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ConvertToCSV.py')
+  run = lambda: subprocess.run([sys.executable, script, '-f', filename], cwd=folder, stdout=subprocess.DEVNULL, check=True)
+
+  return Measure(run, scale, repeat)
+
+BENCHMARKS = {
+  'sanitize': BenchSanitize,
+  'price': BenchPrice,
+  'parse': BenchParse,
+  'load': BenchLoad,
+  'load_keys': BenchLoadKeys,
+  'load_compact': BenchLoadCompact,
+  'save': BenchSave,
+  'save_compact': BenchSaveCompact,
+  'convert': BenchConvert,
+}
+
+def PeakRSS():
+  '''
+  Peak resident memory in MB of this process and its finished children (Linux reports KB).
+  '''
+  return round(max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024, 1)
+
+def RunSingle(name, scale, folder, repeat):
+  '''
+  Run one benchmark in this process and print the result as JSON.
+  '''
+  result = BENCHMARKS[name](scale, folder, repeat)
+  result['peak_rss_mb'] = PeakRSS()
+  print(json.dumps(result))
+
+def Run(names, scale, folder, repeat):
+  '''
+  Run each benchmark in its own process, so the peak memory is its own.
+  '''
+  Dataset(scale, folder)
+  results = {}
+  for name in names:
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--single', name, '-n', str(scale), '-f', folder, '-r', str(repeat)],
+                            stdout=subprocess.PIPE, check=True, text=True).stdout
+    results[name] = json.loads(output.strip().splitlines()[-1])
+    scraper.Log(scraper.INFO, f"{name:<12} {results[name]['ops_per_sec']:>12.1f} ops/s {results[name]['peak_rss_mb']:>9.1f} MB")
+
+  return results
+
+def Compare(results, baseline):
+  '''
+  Print the change against a baseline. Positive is faster or with less memory.
+  '''
+  print(f"{'benchmark':<12} {'ops/s':>12} {'baseline':>12} {'change':>8} {'MB':>9} {'baseline':>9} {'change':>8}")
+  for name, result in results.items():
+    if name in baseline:
+      old = baseline[name]
+      speed = (result['ops_per_sec'] / old['ops_per_sec'] - 1) * 100 if old['ops_per_sec'] > 0 else 0.0
+      memory = (1 - result['peak_rss_mb'] / old['peak_rss_mb']) * 100 if old['peak_rss_mb'] > 0 else 0.0
+      print(f"{name:<12} {result['ops_per_sec']:>12.1f} {old['ops_per_sec']:>12.1f} {speed:>+7.1f}% "
+            f"{result['peak_rss_mb']:>9.1f} {old['peak_rss_mb']:>9.1f} {memory:>+7.1f}%")
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description='Benchmarks of parsing, saving, loading and converting the games, with synthetic data.')
+  parser.add_argument('-n', '--scale',   type=int, default=SCALES[0],      help=f'Number of games of the dataset ({", ".join(str(scale) for scale in SCALES)}...)')
+  parser.add_argument('-b', '--bench',   type=str, default='',             help=f'Comma separated benchmarks to run ({", ".join(BENCHMARKS)}), all by default')
+  parser.add_argument('-f', '--folder',  type=str, default=DEFAULT_FOLDER, help='Folder of the generated datasets')
+  parser.add_argument('-r', '--repeat',  type=int, default=DEFAULT_REPEAT, help='Runs of each benchmark, the best one is used')
+  parser.add_argument('-s', '--save',    type=str, default='',             help='Save the results as a baseline in this JSON file')
+  parser.add_argument('-c', '--compare', type=str, default='',             help='Compare the results with a baseline JSON file')
+  parser.add_argument('--single',        type=str, default='',             help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.single != '':
+    RunSingle(args.single, args.scale, args.folder, args.repeat)
+    sys.exit()
+
+  scraper.Log(scraper.INFO, f'Steam games benchmarks {__version__} by {__author__}')
+  names = [name.strip() for name in args.bench.split(',') if name.strip() != ''] or list(BENCHMARKS)
+  for name in names:
+    if name not in BENCHMARKS:
+      scraper.Log(scraper.ERROR, f"Unknown benchmark '{name}'")
+      sys.exit(1)
+
+  results = Run(names, args.scale, args.folder, args.repeat)
+  report = {'scale': args.scale, 'python': sys.version.split()[0], 'time': int(time.time()), 'results': results}
+
+  if args.compare != '':
+    with open(args.compare, 'r', encoding='utf-8') as fin:
+      baseline = json.load(fin)
+    if baseline.get('scale') != args.scale:
+      scraper.Log(scraper.WARNING, f"The baseline was made with {baseline.get('scale')} games")
+    Compare(results, baseline['results'])
+
+  if args.save != '':
+    with open(args.save, 'w', encoding='utf-8') as fout:
+      json.dump(report, fout, indent=4)
+    scraper.Log(scraper.INFO, f"Baseline saved in '{args.save}'")
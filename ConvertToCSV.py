@@ -16,13 +16,69 @@
 __author__ = "Martin Bustos <fronkongames@gmail.com>"
 __copyright__ = "Copyright 2022, Martin Bustos"
 __license__ = "MIT"
-__version__ = "1.2.0"
+__version__ = "1.3.0"
 __email__ = "fronkongames@gmail.com"
 
 import sys
 import os
+import csv
+import time
 import json
 import argparse
+import itertools
+import collections
+from multiprocessing import Pool
+from SteamDatabase import GameDatabase
+from GameShards import IterGames, IterGameKeys, IterGamesRaw
+
+DEFAULT_OUTPUT  = 'games.csv'
+DEFAULT_WORKERS = 0
+CHUNK_SIZE      = 100
+PROGRESS_TIME   = 0.25 # Seconds between updates of the progress bar
+
+# Header, key in the dataset, type of value and default value.
+COLUMNS = [
+  ('AppID',                      'appid',                    'id',     ''),
+  ('Name',                       'name',                     'string', ''),
+  ('Release date',               'release_date',             'string', ''),
+  ('Estimated owners',           'estimated_owners',         'string', ''),
+  ('Peak CCU',                   'peak_ccu',                 'number', 0),
+  ('Required age',               'required_age',             'number', 0),
+  ('Price',                      'price',                    'number', 0.0),
+  ('Discount',                   'discount',                 'number', 0),
+  ('DLC count',                  'dlc_count',                'number', 0),
+  ('About the game',             'about_the_game',           'string', ''),
+  ('Supported languages',        'supported_languages',      'string', ''),
+  ('Full audio languages',       'full_audio_languages',     'string', ''),
+  ('Reviews',                    'reviews',                  'string', ''),
+  ('Header image',               'header_image',             'string', ''),
+  ('Website',                    'website',                  'string', ''),
+  ('Support url',                'support_url',              'string', ''),
+  ('Support email',              'support_email',            'string', ''),
+  ('Windows',                    'windows',                  'number', False),
+  ('Mac',                        'mac',                      'number', False),
+  ('Linux',                      'linux',                    'number', False),
+  ('Metacritic score',           'metacritic_score',         'number', 0),
+  ('Metacritic url',             'metacritic_url',           'string', ''),
+  ('User score',                 'user_score',               'number', 0),
+  ('Positive',                   'positive',                 'number', 0),
+  ('Negative',                   'negative',                 'number', 0),
+  ('Score rank',                 'score_rank',               'string', ''),
+  ('Achievements',               'achievements',             'number', 0),
+  ('Recommendations',            'recommendations',          'number', 0),
+  ('Notes',                      'notes',                    'string', ''),
+  ('Average playtime forever',   'average_playtime_forever', 'number', 0),
+  ('Average playtime two weeks', 'average_playtime_2weeks',  'number', 0),
+  ('Median playtime forever',    'median_playtime_forever',  'number', 0),
+  ('Median playtime two weeks',  'median_playtime_2weeks',   'number', 0),
+  ('Developers',                 'developers',               'list',   ''),
+  ('Publishers',                 'publishers',               'list',   ''),
+  ('Categories',                 'categories',               'list',   ''),
+  ('Genres',                     'genres',                   'list',   ''),
+  ('Tags',                       'tags',                     'list',   ''),
+  ('Screenshots',                'screenshots',              'list',   ''),
+  ('Movies',                     'movies',                   'list',   '')
+]
 
 def ProgressBar(count, total):
   bar_len = 50
@@ -34,140 +90,167 @@ def ProgressBar(count, total):
   sys.stdout.write(f'{bar} {percents}%\r')
   sys.stdout.flush()
 
-def WriteString(app, key, default = ''):
-  value = default
-  if key in app and app[key] != None and app[key] != '':
-    value = str(app[key]).replace('"', '').replace('\n', ' ').replace('\r', ' ').strip()
-  return f'"{value}"'
-
-def WriteStringArray(app, key):
-  if key not in app or app[key] is None:
-    return '""'
-  values = []
-  for value in app[key]:
-    if value != None:
-      values.append(value.replace('"', '').replace('\n', ' ').replace('\r', ' ').strip())
-
-  text = ','.join(values)
-  return f'"{text}"'
-
-def WriteKey(app, key, default = '0'):
-  return str(app[key]) if key in app else default
-
-print(f'Convert JSON to CSV {__version__} by {__author__}.')
-parser = argparse.ArgumentParser(description='Convert JSON to CSV.')
-parser.add_argument('-f', '--file', type=str, default='games.json', help='Dataset file name')
-args = parser.parse_args()
-
-dataset = {}
-
-filename = args.file
-if os.path.exists(filename):
-  print('Loading dataset.')
-  with open(filename, 'r', encoding='utf-8') as fin:
-    text = fin.read()
-    if len(text) > 0:
-      dataset = json.loads(text)
-
-  print(f'Dataset with {len(dataset)} games loaded.')
-
-  with open('games.csv', 'w', encoding="utf-8") as fout:
-    header = [
-      'AppID',
-      'Name',
-      'Release date',
-      'Estimated owners',
-      'Peak CCU',
-      'Required age',
-      'Price',
-      'Discount',
-      'DLC count',
-      'About the game',
-      'Supported languages',
-      'Full audio languages',
-      'Reviews',
-      'Header image',
-      'Website',
-      'Support url',
-      'Support email',
-      'Windows',
-      'Mac',
-      'Linux',
-      'Metacritic score',
-      'Metacritic url',
-      'User score',
-      'Positive',
-      'Negative',
-      'Score rank',
-      'Achievements',
-      'Recommendations',
-      'Notes',
-      'Average playtime forever',
-      'Average playtime two weeks',
-      'Median playtime forever',
-      'Median playtime two weeks',
-      'Developers',
-      'Publishers',
-      'Categories',
-      'Genres',
-      'Tags',
-      'Screenshots',
-      'Movies'
-    ]
-
-    fout.write(','.join(header) + '\n')
-
-    count = 0
-    total = len(dataset)
-    for appID in dataset:
-      app = dataset[appID]
-
-      data = f"{appID},"
-      data += f"{WriteString(app, 'name')},"
-      data += f"{WriteString(app, 'release_date')},"
-      data += f"{WriteString(app, 'estimated_owners')},"
-      data += f"{WriteKey(app, 'peak_ccu')},"
-      data += f"{WriteKey(app, 'required_age')},"
-      data += f"{WriteKey(app, 'price', '0.0')},"
-      data += f"{WriteKey(app, 'discount')},"
-      data += f"{WriteKey(app, 'dlc_count')},"
-      data += f"{WriteString(app, 'about_the_game')},"
-      data += f"{WriteString(app, 'supported_languages')},"
-      data += f"{WriteString(app, 'full_audio_languages')},"
-      data += f"{WriteString(app, 'reviews')},"
-      data += f"{WriteString(app, 'header_image')},"
-      data += f"{WriteString(app, 'website')},"
-      data += f"{WriteString(app, 'support_url')},"
-      data += f"{WriteString(app, 'support_email')},"
-      data += f"{WriteKey(app, 'windows', 'False')},"
-      data += f"{WriteKey(app, 'mac', 'False')},"
-      data += f"{WriteKey(app, 'linux', 'False')},"
-      data += f"{WriteKey(app, 'metacritic_score')},"
-      data += f"{WriteString(app, 'metacritic_url')},"
-      data += f"{WriteKey(app, 'user_score')},"
-      data += f"{WriteKey(app, 'positive')},"
-      data += f"{WriteKey(app, 'negative')},"
-      data += f"{WriteString(app, 'score_rank')},"
-      data += f"{WriteKey(app, 'achievements')},"
-      data += f"{WriteKey(app, 'recommendations')},"
-      data += f"{WriteString(app, 'notes')},"
-      data += f"{WriteKey(app, 'average_playtime_forever')},"
-      data += f"{WriteKey(app, 'average_playtime_2weeks')},"
-      data += f"{WriteKey(app, 'median_playtime_forever')},"
-      data += f"{WriteKey(app, 'median_playtime_2weeks')},"
-      data += f"{WriteStringArray(app, 'developers')},"
-      data += f"{WriteStringArray(app, 'publishers')},"
-      data += f"{WriteStringArray(app, 'categories')},"
-      data += f"{WriteStringArray(app, 'genres')},"
-      data += f"{WriteStringArray(app, 'tags')},"
-      data += f"{WriteStringArray(app, 'screenshots')},"
-      data += f"{WriteStringArray(app, 'movies')}"
-      data += "\n"
-
-      fout.write(data)
-      count += 1
-      ProgressBar(count, total)
-  
+def CleanText(value):
+  '''
+  Text in one line.
+  '''
+  text = str(value)
+  if '\n' in text or '\r' in text:
+    text = text.replace('\n', ' ').replace('\r', ' ')
+
+  return text.strip()
+
+def Quote(text):
+  '''
+  Quoted text with the quotes inside doubled, like csv.writer does.
+  '''
+  return '"' + text.replace('"', '""') + '"'
+
+def ToNumber(value):
+  '''
+  Numbers stored as text, like the SteamSpy discount, are written as numbers.
+  '''
+  if isinstance(value, str):
+    try:
+      return int(value)
+    except ValueError:
+      try:
+        return float(value)
+      except ValueError:
+        return value
+  return value
+
+def FormatValue(appID, app, key, kind, default):
+  '''
+  CSV field of a value: numbers as they are, text quoted.
+  '''
+  if kind == 'id':
+    return appID if appID.isdigit() else Quote(appID)
+
+  value = app.get(key)
+  if value is None or value == '':
+    value = default
+  elif kind == 'string':
+    value = CleanText(value)
+  elif kind == 'list':
+    # Of the tags, a dictionary, the names.
+    value = ','.join(CleanText(item) for item in value if item is not None)
+  else:
+    value = ToNumber(value)
+
+  return Quote(value) if isinstance(value, str) else str(value)
+
+def FormatChunk(chunk, columns):
+  '''
+  CSV text of a list of (appID, app). The apps can be JSON text still to decode. The output is the same as
+  csv.writer with QUOTE_NONNUMERIC, several times faster with long descriptions.
+  '''
+  lines = []
+  for appID, app in chunk:
+    if isinstance(app, (bytes, str)):
+      app = json.loads(app)
+    lines.append(','.join([FormatValue(appID, app, key, kind, default) for header, key, kind, default in columns]) + '\n')
+
+  return ''.join(lines)
+
+def Chunks(dataset, size):
+  '''
+  Lists of 'size' (appID, app) read from the dataset.
+  '''
+  while True:
+    chunk = list(itertools.islice(dataset, size))
+    if len(chunk) == 0:
+      return
+    yield chunk
+
+def FormatParallel(dataset, columns, pool, workers):
+  '''
+  Yields the CSV text of the chunks in order, formatted by the pool. The dataset is read from this thread, with up to
+  two chunks per worker in flight.
+  '''
+  pending = collections.deque()
+  for chunk in Chunks(iter(dataset), CHUNK_SIZE):
+    pending.append(pool.apply_async(FormatChunk, (chunk, columns)))
+    if len(pending) >= workers * 2:
+      yield pending.popleft().get()
+
+  while len(pending) > 0:
+    yield pending.popleft().get()
+
+def Convert(dataset, total, columns, output, workers):
+  '''
+  Write the games to a CSV file. With workers, chunks of games are formatted in other processes and written in order.
+  '''
+  pool = Pool(workers) if workers > 1 else None
+  try:
+    if pool is not None:
+      texts = FormatParallel(dataset, columns, pool, workers)
+    else:
+      texts = (FormatChunk(chunk, columns) for chunk in Chunks(iter(dataset), CHUNK_SIZE))
+
+    with open(output, 'w', encoding='utf-8', newline='') as fout:
+      csv.writer(fout, lineterminator='\n').writerow([header for header, key, kind, default in columns])
+
+      count = 0
+      updated = 0.0
+      for text in texts:
+        fout.write(text)
+        count = min(count + CHUNK_SIZE, total)
+        if time.monotonic() - updated > PROGRESS_TIME:
+          ProgressBar(count, max(total, 1))
+          updated = time.monotonic()
+
+      ProgressBar(total, max(total, 1))
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+
+def SelectColumns(names):
+  '''
+  Columns by key or header, in the given order. All of them if there are no names.
+  '''
+  if names == '':
+    return COLUMNS
+
+  columns = []
+  for name in names.split(','):
+    column = next((column for column in COLUMNS if name.strip().lower() in (column[0].lower(), column[1])), None)
+    if column is None:
+      print(f"Unknown column '{name.strip()}'. Columns: {', '.join(column[1] for column in COLUMNS)}")
+      sys.exit(1)
+    columns.append(column)
+
+  return columns
+
+if __name__ == "__main__":
+  print(f'Convert JSON to CSV {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Convert JSON to CSV.')
+  parser.add_argument('-f', '--file', type=str, default='games.json', help='Dataset file name, or folder of shards')
+  parser.add_argument('-d', '--database', type=str, default='', help='Read the games from a SQLite database instead')
+  parser.add_argument('-o', '--output', type=str, default=DEFAULT_OUTPUT, help='CSV file name')
+  parser.add_argument('-c', '--columns', type=str, default='', help='Comma separated columns to write, by key or header (all by default)')
+  parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS, help='Number of processes formatting the rows (0 or 1 to use only this one)')
+  args = parser.parse_args()
+
+  columns = SelectColumns(args.columns)
+
+  filename = args.database if args.database != '' else args.file
+  if os.path.exists(filename):
+    print('Loading dataset.')
+    # Games are read one at a time while writing. With workers, they are decoded by them.
+    if args.database != '':
+      games = GameDatabase(filename).games
+      total = len(games)
+      dataset = games.RawItems() if args.workers > 1 else games.items()
+    else:
+      total = sum(1 for _ in IterGameKeys(filename))
+      dataset = IterGamesRaw(filename) if args.workers > 1 else IterGames(filename)
+
+    print(f'Dataset with {total} games loaded.')
+
+    Convert(dataset, total, columns, args.output, args.workers)
+
     print('\nDone.')
-else:
-  print(f'Dataset file \'{args.file}\' not found.')
\ No newline at end of file
+  else:
+    print(f'Dataset file \'{filename}\' not found.')
@@ -0,0 +1,230 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import ast
+import json
+import mmap
+import array
+import argparse
+from SteamDatabase import GameDatabase
+from GameShards import IterGames
+
+DEFAULT_FOLDER = 'games_columns'
+META_FILE      = 'meta.json'
+NPY_MAGIC      = b'\x93NUMPY\x01\x00'
+# array type code and numpy description, little endian.
+DESCR = {'I': '<u4', 'q': '<i8', 'd': '<f8', 'i': '<i4', 'B': '|u1'}
+
+# Key and array type code of the numeric columns.
+NUMBERS = [
+  ('price', 'd'), ('required_age', 'q'), ('dlc_count', 'q'), ('peak_ccu', 'q'), ('positive', 'q'), ('negative', 'q'),
+  ('user_score', 'q'), ('metacritic_score', 'q'), ('achievements', 'q'), ('recommendations', 'q'), ('discount', 'q'),
+  ('average_playtime_forever', 'q'), ('average_playtime_2weeks', 'q'), ('median_playtime_forever', 'q'),
+  ('median_playtime_2weeks', 'q'), ('windows', 'B'), ('mac', 'B'), ('linux', 'B'), ('fetched', 'q')
+]
+# Text columns, each value stored once.
+TEXTS = ['name', 'release_date', 'estimated_owners', 'score_rank', 'header_image', 'website', 'metacritic_url']
+# List columns, dictionary encoded. The tags also have their votes.
+LISTS = ['developers', 'publishers', 'categories', 'genres', 'supported_languages', 'full_audio_languages', 'tags']
+
+def WriteNPY(values, filename):
+  '''
+  Write an array as a NumPy .npy file (version 1.0), readable with numpy.load(filename, mmap_mode='r').
+  '''
+  if sys.byteorder != 'little' and values.itemsize > 1:
+    values = array.array(values.typecode, values)
+    values.byteswap()
+
+  header = f"{{'descr': '{DESCR[values.typecode]}', 'fortran_order': False, 'shape': ({len(values)},), }}"
+  # The data starts aligned to 64 bytes.
+  header += ' ' * (63 - (len(NPY_MAGIC) + 2 + len(header)) % 64) + '\n'
+  with open(filename, 'wb') as fout:
+    fout.write(NPY_MAGIC + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+    values.tofile(fout)
+
+def ReadNPY(filename):
+  '''
+  Memory mapped values of a .npy file written by WriteNPY, without copying them.
+  '''
+  with open(filename, 'rb') as fin:
+    if fin.read(len(NPY_MAGIC)) != NPY_MAGIC:
+      raise ValueError(f"'{filename}' is not a .npy file version 1.0")
+    size = int.from_bytes(fin.read(2), 'little')
+    header = ast.literal_eval(fin.read(size).decode('latin1'))
+    typecode = next(typecode for typecode, descr in DESCR.items() if descr == header['descr'])
+    if sys.byteorder != 'little' and array.array(typecode).itemsize > 1:
+      values = array.array(typecode)
+      values.frombytes(fin.read())
+      values.byteswap()
+      return memoryview(values)
+
+    offset = len(NPY_MAGIC) + 2 + size
+    if os.path.getsize(filename) == offset:
+      return memoryview(array.array(typecode))
+
+    data = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+
+  return memoryview(data)[offset:].cast(typecode)
+
+def ToNumber(value, typecode):
+  try:
+    return float(value) if typecode == 'd' else int(value)
+  except (TypeError, ValueError):
+    return 0
+
+class Dictionary:
+  '''
+  Different values of a column and their index.
+  '''
+  def __init__(self):
+    self.values = []
+    self.index = {}
+
+  def Code(self, value):
+    code = self.index.get(value)
+    if code is None:
+      code = self.index[value] = len(self.values)
+      self.values.append(value)
+    return code
+
+def Convert(dataset, folder):
+  '''
+  Write the games as columns in a folder. Numbers are arrays of a type. Texts are offsets to the UTF-8 bytes of
+  each one, or codes of a dictionary of values. Lists are offsets to codes of a dictionary, and the tags also have
+  their votes.
+  '''
+  appIDs = array.array('I')
+  numbers = {key: array.array(typecode) for key, typecode in NUMBERS}
+  texts = {key: (array.array('q', [0]), bytearray()) for key in TEXTS}
+  lists = {key: (array.array('q', [0]), array.array('i'), Dictionary()) for key in LISTS}
+  votes = array.array('q')
+
+  for appID, game in dataset:
+    appIDs.append(int(appID))
+    for key, typecode in NUMBERS:
+      numbers[key].append(ToNumber(game.get(key, 0), typecode))
+
+    for key in TEXTS:
+      offsets, data = texts[key]
+      data += str(game.get(key) or '').encode('utf-8')
+      offsets.append(len(data))
+
+    for key in LISTS:
+      offsets, codes, dictionary = lists[key]
+      values = game.get(key) or []
+      for value in values:
+        codes.append(dictionary.Code(value))
+      if key == 'tags':
+        # Old datasets have the tags in a list, without votes.
+        votes.extend(int(values[value]) if isinstance(values, dict) else 0 for value in values)
+      offsets.append(len(codes))
+
+  os.makedirs(folder, exist_ok=True)
+  WriteNPY(appIDs, os.path.join(folder, 'appid.npy'))
+  for key, values in numbers.items():
+    WriteNPY(values, os.path.join(folder, f'{key}.npy'))
+
+  for key, (offsets, data) in texts.items():
+    WriteNPY(offsets, os.path.join(folder, f'{key}.offsets.npy'))
+    WriteNPY(array.array('B', data), os.path.join(folder, f'{key}.data.npy'))
+
+  for key, (offsets, codes, dictionary) in lists.items():
+    WriteNPY(offsets, os.path.join(folder, f'{key}.offsets.npy'))
+    WriteNPY(codes, os.path.join(folder, f'{key}.codes.npy'))
+    with open(os.path.join(folder, f'{key}.values.json'), 'w', encoding='utf-8') as fout:
+      json.dump(dictionary.values, fout, ensure_ascii=False)
+  WriteNPY(votes, os.path.join(folder, 'tags.votes.npy'))
+
+  with open(os.path.join(folder, META_FILE), 'w', encoding='utf-8') as fout:
+    json.dump({'games': len(appIDs), 'numbers': [key for key, typecode in NUMBERS], 'texts': TEXTS, 'lists': LISTS}, fout, indent=4)
+
+  return len(appIDs)
+
+class Columns:
+  '''
+  Games of a folder written by Convert(). Columns are memory mapped, and read only when used.
+  '''
+  def __init__(self, folder=DEFAULT_FOLDER):
+    self.folder = folder
+    with open(os.path.join(folder, META_FILE), 'r', encoding='utf-8') as fin:
+      self.meta = json.load(fin)
+    self.arrays = {}
+    self.values = {}
+
+  def __len__(self):
+    return self.meta['games']
+
+  def Array(self, name):
+    '''
+    Values of a column file, like 'price' or 'tags.codes'.
+    '''
+    if name not in self.arrays:
+      self.arrays[name] = ReadNPY(os.path.join(self.folder, f'{name}.npy'))
+    return self.arrays[name]
+
+  def Values(self, key):
+    '''
+    Dictionary of a list column.
+    '''
+    if key not in self.values:
+      with open(os.path.join(self.folder, f'{key}.values.json'), 'r', encoding='utf-8') as fin:
+        self.values[key] = json.load(fin)
+    return self.values[key]
+
+  def Text(self, key, row):
+    offsets = self.Array(f'{key}.offsets')
+    return bytes(self.Array(f'{key}.data')[offsets[row]:offsets[row + 1]]).decode('utf-8')
+
+  def List(self, key, row):
+    offsets = self.Array(f'{key}.offsets')
+    values = self.Values(key)
+    return [values[code] for code in self.Array(f'{key}.codes')[offsets[row]:offsets[row + 1]]]
+
+  def Tags(self, row):
+    offsets = self.Array('tags.offsets')
+    start, end = offsets[row], offsets[row + 1]
+    return dict(zip(self.List('tags', row), self.Array('tags.votes')[start:end]))
+
+  def Count(self, key):
+    '''
+    Number of games with each value of a list column.
+    '''
+    counts = [0] * len(self.Values(key))
+    for code in self.Array(f'{key}.codes'):
+      counts[code] += 1
+    return dict(zip(self.Values(key), counts))
+
+if __name__ == "__main__":
+  print(f'Convert JSON to columns {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Convert the games to column files, readable with NumPy.')
+  parser.add_argument('-f', '--file',     type=str, default='games.json',   help='Dataset file name, or folder of shards')
+  parser.add_argument('-d', '--database', type=str, default='',             help='Read the games from a SQLite database instead')
+  parser.add_argument('-o', '--output',   type=str, default=DEFAULT_FOLDER, help='Output folder')
+  args = parser.parse_args()
+
+  filename = args.database if args.database != '' else args.file
+  if os.path.exists(filename):
+    dataset = GameDatabase(filename).games.items() if args.database != '' else IterGames(filename)
+    print(f"{Convert(dataset, args.output)} games written to '{args.output}'.")
+  else:
+    print(f'Dataset file \'{filename}\' not found.')
@@ -0,0 +1,344 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import re
+import sys
+import json
+import mmap
+import bisect
+import argparse
+import datetime as dt
+from array import array
+from GameShards import IsShards, IterGames, ShardedGames
+from ReleaseDate import ParseReleaseDate
+
+INDEX_EXT = '.index'
+META_FILE = 'meta.json'
+TERMS_FILE = 'terms.bin'
+INDEX_VERSION = 1
+# Fields with lists of values (the names of the tags), indexed by value.
+TERMS = ['genres', 'categories', 'tags', 'developers', 'publishers', 'supported_languages']
+FLAGS = ['windows', 'mac', 'linux']
+# Numeric fields, searched by range. The release date is the number of days since 1970-01-01.
+NUMBERS = ['price', 'positive', 'negative', 'release_date', 'metacritic_score', 'peak_ccu']
+EPOCH = dt.date(1970, 1, 1)
+ONES = re.compile('1')
+
+def ReleaseDay(text):
+  '''
+  Days since 1970-01-01 of a release date in text, NaN if it can not be parsed.
+  '''
+  date = ParseReleaseDate(text) if isinstance(text, str) else None
+
+  return (date - EPOCH).days if date is not None else float('nan')
+
+def Day(value):
+  '''
+  Days since 1970-01-01 of a date, a 'YYYY-MM-DD' text or a number of days.
+  '''
+  if isinstance(value, str):
+    value = dt.date.fromisoformat(value)
+  if isinstance(value, dt.date):
+    return (value - EPOCH).days
+
+  return value
+
+def NumberOf(game, field):
+  if field == 'release_date':
+    return ReleaseDay(game.get(field))
+
+  value = game.get(field)
+  return float(value) if isinstance(value, (int, float)) else float('nan')
+
+def Bitmap(rows, count):
+  '''
+  Bitmap, as a Python int, with the bits of the rows set.
+  '''
+  bits = bytearray((count + 7) // 8)
+  for row in rows:
+    bits[row >> 3] |= 1 << (row & 7)
+
+  return int.from_bytes(bits, 'little')
+
+def Rows(bitmap):
+  '''
+  Rows of the bits set in a bitmap, sorted.
+  '''
+  return [match.start() for match in ONES.finditer(bin(bitmap)[:1:-1])]
+
+def BuildIndex(filename, folder):
+  '''
+  Read the games once and write the index: the rows of each value of TERMS and FLAGS, and the values of NUMBERS
+  and the rows sorted by them. Each list of rows is written as a bitmap if that is smaller.
+  '''
+  appIDs = []
+  postings = {field: {} for field in TERMS + FLAGS}
+  numbers = {field: array('d') for field in NUMBERS}
+  for row, (appID, game) in enumerate(IterGames(filename)):
+    appIDs.append(appID)
+    for field in TERMS:
+      values = game.get(field) or []
+      for value in (values.keys() if isinstance(values, dict) else values):
+        postings[field].setdefault(value, array('I')).append(row)
+    for field in FLAGS:
+      if game.get(field):
+        postings[field].setdefault('true', array('I')).append(row)
+    for field in NUMBERS:
+      numbers[field].append(NumberOf(game, field))
+
+  count = len(appIDs)
+  temporary = folder + '.tmp'
+  os.makedirs(temporary, exist_ok=True)
+  terms = {}
+  with open(os.path.join(temporary, TERMS_FILE), 'wb') as fout:
+    for field, values in postings.items():
+      terms[field] = {}
+      for value, rows in values.items():
+        dense = len(rows) * 4 > (count + 7) // 8
+        data = Bitmap(rows, count).to_bytes((count + 7) // 8, 'little') if dense else rows.tobytes()
+        terms[field][value] = [fout.tell(), len(rows), dense]
+        fout.write(data)
+
+  for field, values in numbers.items():
+    order = array('I', sorted((row for row in range(count) if values[row] == values[row]), key=values.__getitem__))
+    with open(os.path.join(temporary, field + '.values'), 'wb') as fout:
+      values.tofile(fout)
+    with open(os.path.join(temporary, field + '.order'), 'wb') as fout:
+      order.tofile(fout)
+
+  stat = os.stat(filename)
+  with open(os.path.join(temporary, META_FILE), 'w', encoding='utf-8') as fout:
+    json.dump({'version': INDEX_VERSION, 'byteorder': sys.byteorder, 'source': [stat.st_size, stat.st_mtime],
+               'count': count, 'appids': appIDs, 'terms': terms}, fout, ensure_ascii=False)
+
+  if os.path.exists(folder):
+    for name in os.listdir(folder):
+      os.remove(os.path.join(folder, name))
+    os.rmdir(folder)
+  os.replace(temporary, folder)
+
+class Dataset:
+  '''
+  Games of a JSON file or a folder of shards, with indexes to find them. Nothing is read until it is used: the
+  index, saved next to the dataset ('games.index'), is built the first time and when the dataset changes, and the
+  games are only loaded to return them.
+
+  Query() combines filters of values (all of them), flags and ranges with bitmaps, and returns the appIDs:
+
+    dataset.Query(linux=True, tags='Roguelike', price=(None, 10), positive=(1000, None))
+  '''
+  def __init__(self, filename='games.json', folder=None):
+    self.filename = filename
+    self.folder = folder or os.path.splitext(filename)[0] + INDEX_EXT
+    self.meta = None
+    self.terms = None
+    self.numbers = {}
+    self.games = None
+
+  def Load(self):
+    '''
+    Open the index, building it if it does not exist or is older than the dataset.
+    '''
+    if self.meta is not None:
+      return
+
+    metaFile = os.path.join(self.folder, META_FILE)
+    meta = None
+    if os.path.exists(metaFile):
+      with open(metaFile, 'r', encoding='utf-8') as fin:
+        meta = json.load(fin)
+      stat = os.stat(self.filename)
+      if (meta['version'] != INDEX_VERSION or meta['byteorder'] != sys.byteorder or
+          meta['source'] != [stat.st_size, stat.st_mtime]):
+        meta = None
+
+    if meta is None:
+      BuildIndex(self.filename, self.folder)
+      with open(metaFile, 'r', encoding='utf-8') as fin:
+        meta = json.load(fin)
+
+    self.meta = meta
+    self.all = (1 << meta['count']) - 1
+    with open(os.path.join(self.folder, TERMS_FILE), 'rb') as fin:
+      self.terms = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(fin.name) > 0 else b''
+
+  def Number(self, field):
+    '''
+    Values of a numeric field by row, and the rows sorted by value (without the missing ones) with their values.
+    '''
+    if field not in self.numbers:
+      self.Load()
+      values = array('d')
+      order = array('I')
+      with open(os.path.join(self.folder, field + '.values'), 'rb') as fin:
+        values.fromfile(fin, self.meta['count'])
+      with open(os.path.join(self.folder, field + '.order'), 'rb') as fin:
+        order.frombytes(fin.read())
+      self.numbers[field] = (values, order, array('d', (values[row] for row in order)))
+
+    return self.numbers[field]
+
+  def Term(self, field, value):
+    '''
+    Bitmap of the rows with a value in a field.
+    '''
+    self.Load()
+    entry = self.meta['terms'][field].get(value)
+    if entry is None:
+      return 0
+
+    offset, count, dense = entry
+    if dense:
+      return int.from_bytes(self.terms[offset:offset + (self.meta['count'] + 7) // 8], 'little')
+
+    return Bitmap(array('I', self.terms[offset:offset + count * 4]), self.meta['count'])
+
+  def Values(self, field):
+    '''
+    Values of a field of TERMS, with the number of games of each one, from the most common.
+    '''
+    self.Load()
+    return sorted(((value, entry[1]) for value, entry in self.meta['terms'][field].items()), key=lambda item: -item[1])
+
+  def Rows(self, **filters):
+    '''
+    Rows of the games that match all the filters. See Query().
+    '''
+    self.Load()
+    bitmap = self.all
+    ranges = []
+    for field, value in filters.items():
+      if field in TERMS:
+        for term in ([value] if isinstance(value, str) else value):
+          bitmap &= self.Term(field, term)
+      elif field in FLAGS:
+        flag = self.Term(field, 'true')
+        bitmap &= flag if value else self.all & ~flag
+      elif field in NUMBERS:
+        low, high = value
+        if field == 'release_date':
+          low, high = Day(low), Day(high)
+        values, order, ordered = self.Number(field)
+        start = bisect.bisect_left(ordered, low) if low is not None else 0
+        end = bisect.bisect_right(ordered, high) if high is not None else len(ordered)
+        ranges.append((end - start, field, low, high, start, end))
+      else:
+        raise ValueError(f"Unknown filter '{field}'")
+
+    # The most selective ranges first. When there are fewer candidates than games in the range, the candidates
+    # are checked one by one.
+    rows = None
+    for size, field, low, high, start, end in sorted(ranges):
+      values, order, ordered = self.Number(field)
+      if rows is None and size < bitmap.bit_count():
+        bitmap &= Bitmap(order[start:end], self.meta['count'])
+      else:
+        if rows is None:
+          rows = Rows(bitmap)
+        rows = [row for row in rows if (low is None or values[row] >= low) and (high is None or values[row] <= high)]
+
+    return rows if rows is not None else Rows(bitmap)
+
+  def Query(self, **filters):
+    '''
+    AppIDs of the games that match all the filters, in the order of the dataset. Filters:
+
+      genres, categories, tags, developers, publishers, supported_languages: a value or a list of values, all
+      of them must be in the game.
+      windows, mac, linux: True or False.
+      price, positive, negative, release_date, metacritic_score, peak_ccu: (minimum, maximum) range, both
+      included, None for no limit. The dates can be dt.date or 'YYYY-MM-DD'.
+    '''
+    rows = self.Rows(**filters)
+    appIDs = self.meta['appids']
+
+    return [appIDs[row] for row in rows]
+
+  def Count(self, **filters):
+    return len(self.Rows(**filters))
+
+  def Game(self, appID):
+    '''
+    A game, or None. With shards only its block is read, a JSON file is loaded whole the first time.
+    '''
+    if self.games is None:
+      self.games = ShardedGames(self.filename) if IsShards(self.filename) else dict(IterGames(self.filename))
+
+    return self.games.get(appID)
+
+  def Games(self, appIDs):
+    '''
+    Yields the (appID, game) pairs of a list of appIDs.
+    '''
+    for appID in appIDs:
+      yield appID, self.Game(appID)
+
+  def __len__(self):
+    self.Load()
+    return self.meta['count']
+
+if __name__ == "__main__":
+  print(f'Games dataset {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Query the games with indexes. Example: -t Roguelike -p 0,10 --linux')
+  parser.add_argument('-f', '--file',       type=str, default='games.json', help='Dataset file name, or folder of shards')
+  parser.add_argument('-g', '--genres',     type=str, default='',           help='Comma separated genres')
+  parser.add_argument('-t', '--tags',       type=str, default='',           help='Comma separated tags')
+  parser.add_argument('-c', '--categories', type=str, default='',           help='Comma separated categories')
+  parser.add_argument('-d', '--developers', type=str, default='',           help='Comma separated developers')
+  parser.add_argument('-l', '--languages',  type=str, default='',           help='Comma separated supported languages')
+  parser.add_argument('-p', '--price',      type=str, default='',           help='Price range, min,max (empty for no limit)')
+  parser.add_argument('-r', '--positive',   type=str, default='',           help='Positive reviews range, min,max')
+  parser.add_argument('--released',         type=str, default='',           help='Release date range, YYYY-MM-DD,YYYY-MM-DD')
+  parser.add_argument('--windows',          action='store_true',            help='Only Windows games')
+  parser.add_argument('--mac',              action='store_true',            help='Only Mac games')
+  parser.add_argument('--linux',            action='store_true',            help='Only Linux games')
+  parser.add_argument('-n', '--limit',      type=int, default=20,           help='Number of games to print (0 for only the count)')
+  args = parser.parse_args()
+
+  if not os.path.exists(args.file):
+    print(f"Dataset '{args.file}' not found.")
+    sys.exit(1)
+
+  def Range(text, number=float):
+    low, high = (text.split(',') + [''])[:2]
+    return (number(low) if low.strip() else None, number(high) if high.strip() else None)
+
+  filters = {}
+  for field, text in [('genres', args.genres), ('tags', args.tags), ('categories', args.categories),
+                      ('developers', args.developers), ('supported_languages', args.languages)]:
+    if text != '':
+      filters[field] = [value.strip() for value in text.split(',')]
+  for field in FLAGS:
+    if getattr(args, field):
+      filters[field] = True
+  if args.price != '':
+    filters['price'] = Range(args.price)
+  if args.positive != '':
+    filters['positive'] = Range(args.positive)
+  if args.released != '':
+    filters['release_date'] = Range(args.released, str)
+
+  dataset = Dataset(args.file)
+  appIDs = dataset.Query(**filters)
+  print(f'{len(appIDs)} of {len(dataset)} games.')
+  for appID, game in dataset.Games(appIDs[:args.limit]):
+    print(f"{appID:>8}  {game['name'][:50]:<50} {game['price']:>7.2f} {game.get('positive', 0):>8}")
@@ -0,0 +1,156 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import json
+from array import array
+from collections.abc import MutableMapping
+
+# Short strings repeated between games, shared with the vocabulary.
+SYMBOL_FIELDS = {'release_date', 'estimated_owners', 'score_rank', 'discount', 'notes'}
+# Lists of URLs, stored as a common prefix and the rest of each one.
+URL_FIELDS    = {'screenshots', 'movies'}
+URL_SEPARATOR = '\n'
+MAX_COUNT     = (1 << 32) - 1
+
+class GameRecord:
+  '''
+  Compact game: the keys and how each value is stored, shared with the games with the same keys, and the values.
+  '''
+  __slots__ = ('layout', 'values')
+
+  def __init__(self, layout, values):
+    self.layout = layout
+    self.values = values
+
+class CompactDataset(MutableMapping):
+  '''
+  Games stored as GameRecord. The lists of strings (developers, genres, categories, languages...), the tag names
+  and the repeated short texts are shared between the games, the URL lists are stored without their common prefix,
+  and the rest of lists and dicts as JSON text. Each game is decoded on access to a new dict with the same keys,
+  order and values that were stored, so it is saved with the same format.
+  '''
+  def __init__(self, items=()):
+    self.records = {}
+    self.strings = {}
+    self.tuples = {}
+    self.layouts = {}
+    for appID, game in items:
+      self[appID] = game
+
+  def String(self, text):
+    '''
+    Shared copy of a string.
+    '''
+    return self.strings.setdefault(text, text)
+
+  def Strings(self, texts):
+    '''
+    Shared tuple of shared strings.
+    '''
+    names = tuple(self.String(text) for text in texts)
+    return self.tuples.setdefault(names, names)
+
+  def Encode(self, key, value):
+    '''
+    Kind and compact value.
+    '''
+    if isinstance(value, str):
+      return 'value', self.String(value) if key in SYMBOL_FIELDS else value
+
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+      if key in URL_FIELDS and len(value) > 0 and all(URL_SEPARATOR not in url for url in value):
+        # The prefix is usually the folder of the game, it is not shared with other games.
+        prefix = os.path.commonprefix(value)
+        return 'urls', (prefix, URL_SEPARATOR.join(url[len(prefix):] for url in value))
+
+      return 'strings', self.Strings(value)
+
+    if (isinstance(value, dict) and all(isinstance(name, str) for name in value) and
+        all(type(count) is int and 0 <= count <= MAX_COUNT for count in value.values())):
+      return 'counts', (self.Strings(value.keys()), array('I', value.values()))
+
+    if isinstance(value, (list, dict)):
+      return 'json', json.dumps(value, ensure_ascii=False)
+
+    return 'value', value
+
+  def Decode(self, kind, value):
+    if kind == 'value':
+      return value
+    if kind == 'strings':
+      return list(value)
+    if kind == 'urls':
+      prefix, rest = value
+      return [prefix + url for url in rest.split(URL_SEPARATOR)]
+    if kind == 'counts':
+      return dict(zip(value[0], value[1]))
+
+    return json.loads(value)
+
+  def Record(self, game):
+    '''
+    GameRecord of a game dict.
+    '''
+    layout = []
+    values = []
+    for key, value in game.items():
+      kind, compact = self.Encode(key, value)
+      layout.append((key, kind))
+      values.append(compact)
+
+    layout = tuple(layout)
+
+    return GameRecord(self.layouts.setdefault(layout, layout), tuple(values))
+
+  def Game(self, record):
+    '''
+    Game dict of a GameRecord.
+    '''
+    return {key: self.Decode(kind, value) for (key, kind), value in zip(record.layout, record.values)}
+
+  def __getitem__(self, appID):
+    return self.Game(self.records[appID])
+
+  def __setitem__(self, appID, game):
+    self.records[appID] = self.Record(game)
+
+  def __delitem__(self, appID):
+    del self.records[appID]
+
+  def __contains__(self, appID):
+    return appID in self.records
+
+  def __iter__(self):
+    return iter(self.records)
+
+  def __len__(self):
+    return len(self.records)
+
+  def items(self):
+    for appID, record in self.records.items():
+      yield appID, self.Game(record)
+
+  def Vocabulary(self):
+    '''
+    Number of shared strings, lists of strings and layouts.
+    '''
+    return len(self.strings), len(self.tuples), len(self.layouts)
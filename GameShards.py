@@ -0,0 +1,336 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import gzip
+import json
+import mmap
+import shutil
+import struct
+import argparse
+from array import array
+from collections.abc import Mapping
+from SteamDatabase import WriteJSONObject
+from StreamJSON import IterJSON, IterKeys, IterRaw
+
+SHARDS_EXT   = '.shards'
+INDEX_FILE   = 'index.bin'
+SHARD_FILE   = 'games-{0:05d}.jsonl.gz'
+SHARD_GAMES  = 10000
+BLOCK_SIZE   = 1 << 16
+COMPRESSION  = 6
+INDEX_MAGIC  = b'SGI1'
+# Header: magic, number of games, number of shards.
+INDEX_HEADER = struct.Struct('<4sII')
+# Entry: appID, shard, offset and length of the compressed block, start and size of the line in the block.
+INDEX_ENTRY  = struct.Struct('<IIIIII')
+
+def IsShards(path):
+  '''
+  True if the path is a folder of shards.
+  '''
+  return os.path.isdir(path) and os.path.exists(os.path.join(path, INDEX_FILE))
+
+def IsShardsName(path):
+  '''
+  True if the games must be saved as shards: the path is a folder of shards or ends with SHARDS_EXT.
+  '''
+  return path.endswith(SHARDS_EXT) or IsShards(path)
+
+def WriteShards(items, folder, backup=False, shardGames=SHARD_GAMES):
+  '''
+  Write (appID, game) pairs as JSON lines, one '{"appID": game}' object each, in gzip files of 'shardGames' games.
+  Each file is a series of gzip members of about BLOCK_SIZE bytes, a normal gzip file that can also be read one
+  block at a time. The index has one entry per game sorted by appID. The shards are written in a temporary folder
+  that replaces the old one at the end, that is kept adding '.bak' with 'backup'. Returns the number of games.
+  '''
+  temporary = folder + '.tmp'
+  if os.path.exists(temporary):
+    shutil.rmtree(temporary)
+  os.makedirs(temporary)
+
+  entries = array('I')
+  shard = -1
+  fout = None
+  block = bytearray()
+  pending = []
+
+  def Flush():
+    offset = fout.tell()
+    data = gzip.compress(bytes(block), COMPRESSION, mtime=0)
+    fout.write(data)
+    for appID, start, size in pending:
+      entries.extend((appID, shard, offset, len(data), start, size))
+    block.clear()
+    pending.clear()
+
+  try:
+    for count, (appID, game) in enumerate(items):
+      if not appID.isdigit():
+        raise ValueError(f"The appID '{appID}' is not a number")
+
+      if count % shardGames == 0:
+        if fout is not None:
+          if len(block) > 0:
+            Flush()
+          fout.close()
+        shard += 1
+        fout = open(os.path.join(temporary, SHARD_FILE.format(shard)), 'wb')
+
+      line = (json.dumps({appID: game}, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+      pending.append((int(appID), len(block), len(line)))
+      block += line
+      if len(block) >= BLOCK_SIZE:
+        Flush()
+
+    if fout is not None and len(block) > 0:
+      Flush()
+  finally:
+    if fout is not None:
+      fout.close()
+
+  order = sorted(range(len(entries) // 6), key=lambda index: entries[index * 6])
+  with open(os.path.join(temporary, INDEX_FILE), 'wb') as fout:
+    fout.write(INDEX_HEADER.pack(INDEX_MAGIC, len(order), shard + 1))
+    for index in order:
+      fout.write(INDEX_ENTRY.pack(*entries[index * 6:index * 6 + 6]))
+
+  if os.path.exists(folder):
+    if backup:
+      # 'games.shards.bak', so it does not replace the backup of 'games.json'.
+      if os.path.isdir(folder + '.bak'):
+        shutil.rmtree(folder + '.bak')
+      elif os.path.exists(folder + '.bak'):
+        os.remove(folder + '.bak')
+      os.replace(folder, folder + '.bak')
+    else:
+      shutil.rmtree(folder)
+  os.replace(temporary, folder)
+
+  return len(order)
+
+def SplitLine(line):
+  '''
+  AppID and value, in bytes, of a line '{"appID":value}'. The appIDs are numbers, so the first colon ends the key.
+  '''
+  colon = line.index(b':')
+
+  return line[2:colon - 1].decode('ascii'), line[colon + 1:line.rindex(b'}')]
+
+def ShardFiles(folder):
+  with open(os.path.join(folder, INDEX_FILE), 'rb') as fin:
+    magic, count, shards = INDEX_HEADER.unpack(fin.read(INDEX_HEADER.size))
+  if magic != INDEX_MAGIC:
+    raise ValueError(f"'{folder}' has not a valid index")
+
+  return [os.path.join(folder, SHARD_FILE.format(shard)) for shard in range(shards)]
+
+def IterShards(folder):
+  '''
+  Yields the (appID, game) pairs of the shards, in the order they were written.
+  '''
+  for filename in ShardFiles(folder):
+    with gzip.open(filename, 'rb') as fin:
+      for line in fin:
+        for appID, game in json.loads(line).items():
+          yield appID, game
+
+def IterShardsRaw(folder):
+  '''
+  Yields the appIDs and the text of the games, in bytes, to decode them somewhere else.
+  '''
+  for filename in ShardFiles(folder):
+    with gzip.open(filename, 'rb') as fin:
+      for line in fin:
+        yield SplitLine(line)
+
+class ShardIndex:
+  '''
+  Memory mapped index of the shards. The entries are sorted by appID, a game is found with a binary search.
+  '''
+  def __init__(self, folder):
+    self.fin = open(os.path.join(folder, INDEX_FILE), 'rb')
+    self.map = mmap.mmap(self.fin.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, self.count, self.shards = INDEX_HEADER.unpack_from(self.map, 0)
+    if magic != INDEX_MAGIC:
+      raise ValueError(f"'{folder}' has not a valid index")
+
+  def Entry(self, index):
+    return INDEX_ENTRY.unpack_from(self.map, INDEX_HEADER.size + index * INDEX_ENTRY.size)
+
+  def Find(self, appID):
+    '''
+    (shard, offset, length, start, size) of a game, or None.
+    '''
+    if not appID.isdigit():
+      return None
+
+    key = int(appID)
+    low, high = 0, self.count
+    while low < high:
+      middle = (low + high) // 2
+      if INDEX_ENTRY.unpack_from(self.map, INDEX_HEADER.size + middle * INDEX_ENTRY.size)[0] < key:
+        low = middle + 1
+      else:
+        high = middle
+
+    if low < self.count:
+      entry = self.Entry(low)
+      if entry[0] == key:
+        return entry[1:]
+
+    return None
+
+  def Keys(self):
+    '''
+    Yields the appIDs, sorted.
+    '''
+    for index in range(self.count):
+      yield str(INDEX_ENTRY.unpack_from(self.map, INDEX_HEADER.size + index * INDEX_ENTRY.size)[0])
+
+  def __len__(self):
+    return self.count
+
+  def Close(self):
+    self.map.close()
+    self.fin.close()
+
+class ShardedGames(Mapping):
+  '''
+  Read only dictionary view of a folder of shards. Only the block of a game is read and decompressed.
+  '''
+  def __init__(self, folder):
+    self.folder = folder
+    self.index = ShardIndex(folder)
+    self.files = {}
+    self.block = (None, b'')
+
+  def Raw(self, appID):
+    '''
+    Text of a game, in bytes, or None.
+    '''
+    entry = self.index.Find(appID)
+    if entry is None:
+      return None
+
+    shard, offset, length, start, size = entry
+    if self.block[0] != (shard, offset):
+      if shard not in self.files:
+        self.files[shard] = open(os.path.join(self.folder, SHARD_FILE.format(shard)), 'rb')
+      self.files[shard].seek(offset)
+      self.block = ((shard, offset), gzip.decompress(self.files[shard].read(length)))
+
+    return SplitLine(self.block[1][start:start + size])[1]
+
+  def __getitem__(self, appID):
+    raw = self.Raw(appID)
+    if raw is None:
+      raise KeyError(appID)
+
+    return json.loads(raw)
+
+  def __contains__(self, appID):
+    return self.index.Find(appID) is not None
+
+  def __iter__(self):
+    return self.index.Keys()
+
+  def __len__(self):
+    return len(self.index)
+
+  def items(self):
+    '''
+    Stream the games in the order they were written.
+    '''
+    return IterShards(self.folder)
+
+  def Close(self):
+    for fin in self.files.values():
+      fin.close()
+    self.index.Close()
+
+def IterGames(filename):
+  '''
+  Yields the (appID, game) pairs of a JSON file or a folder of shards.
+  '''
+  return IterShards(filename) if IsShards(filename) else IterJSON(filename)
+
+def IterGamesRaw(filename):
+  '''
+  Yields the appIDs and the text of the games, in bytes, of a JSON file or a folder of shards.
+  '''
+  return IterShardsRaw(filename) if IsShards(filename) else IterRaw(filename)
+
+def IterGameKeys(filename):
+  '''
+  Yields the appIDs of a JSON file or, sorted, of a folder of shards.
+  '''
+  if IsShards(filename):
+    index = ShardIndex(filename)
+    try:
+      yield from index.Keys()
+    finally:
+      index.Close()
+  else:
+    yield from IterKeys(filename)
+
+def FindGame(filename, appID):
+  '''
+  A game of a JSON file, read until it is found, or of a folder of shards, using the index. None if it is not there.
+  '''
+  if IsShards(filename):
+    games = ShardedGames(filename)
+    try:
+      return games.get(appID)
+    finally:
+      games.Close()
+
+  for key, game in IterJSON(filename):
+    if key == appID:
+      return game
+
+  return None
+
+if __name__ == "__main__":
+  print(f'Games shards {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Convert games.json to compressed shards with an index, and back.')
+  parser.add_argument('-f', '--file',        type=str, default='games.json',         help='Dataset to convert, a JSON file or a folder of shards')
+  parser.add_argument('-o', '--output',      type=str, default='',                   help='Output, a folder of shards or a JSON file (games.shards or games.json by default)')
+  parser.add_argument('-s', '--shard-games', type=int, default=SHARD_GAMES,          help='Games per shard')
+  parser.add_argument('-g', '--game',        type=str, default='',                   help='Print a game of the dataset')
+  args = parser.parse_args()
+
+  if not os.path.exists(args.file):
+    print(f"Dataset '{args.file}' not found.")
+    sys.exit(1)
+
+  if args.game != '':
+    game = FindGame(args.file, args.game)
+    print(json.dumps(game, indent=4, ensure_ascii=False) if game is not None else f'Game {args.game} not found.')
+  elif IsShards(args.file):
+    output = args.output or os.path.splitext(args.file)[0] + '.json'
+    WriteJSONObject(IterShards(args.file), output)
+    print(f"'{args.file}' converted to '{output}'.")
+  else:
+    output = args.output or os.path.splitext(args.file)[0] + SHARDS_EXT
+    count = WriteShards(IterJSON(args.file), output, shardGames=args.shard_games)
+    print(f"{count} games converted to '{output}'.")
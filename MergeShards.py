@@ -0,0 +1,111 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import argparse
+from SteamDatabase import WriteJSONObject, LoadFile
+from SteamGamesScraper import ShardName, DEFAULT_OUTFILE, DISCARDED_FILE, NOTRELEASED_FILE
+from GameShards import IsShardsName, WriteShards, IterGames
+
+def Winners(filenames):
+  '''
+  For each game, the index of the file with the most recent request ('fetched'). With the same time, the last file.
+  Only the appIDs and times are kept in memory.
+  '''
+  winners = {}
+  fetched = {}
+  for index, filename in enumerate(filenames):
+    for appID, game in IterGames(filename):
+      time = game.get('fetched', 0)
+      if time >= fetched.get(appID, time):
+        winners[appID] = index
+        fetched[appID] = time
+
+  return winners
+
+def MergeGames(filenames, outfile):
+  '''
+  Write the games of several JSON files or folders of shards, each one from the file where it is most recent, to a
+  JSON file or a folder of shards. The games are read one at a time, in two passes. Returns the appIDs written.
+  '''
+  winners = Winners(filenames)
+
+  def Games():
+    for index, filename in enumerate(filenames):
+      for appID, game in IterGames(filename):
+        if winners.get(appID) == index:
+          # Duplicates in the same file are written once.
+          del winners[appID]
+          yield appID, game
+
+  games = set(winners)
+  if IsShardsName(outfile):
+    WriteShards(Games(), outfile)
+  else:
+    WriteJSONObject(Games(), outfile)
+
+  return games
+
+def Merge(files, outfile, discardedFile, notreleasedFile):
+  '''
+  Merge the shard files (games, discarded, not released). A game removes the app from the discarded and not
+  released apps, like the scraper does. Of a not released app, the most recent check is kept.
+  '''
+  games = MergeGames([games for games, discarded, notreleased in files], outfile)
+
+  discarded = {}
+  notreleased = {}
+  for gamesFile, shardDiscarded, shardNotreleased in files:
+    for appID, value in LoadFile(shardDiscarded, {}).items():
+      if appID not in games:
+        discarded[appID] = value
+    shardNotreleased = LoadFile(shardNotreleased, {})
+    if isinstance(shardNotreleased, list):
+      shardNotreleased = {appID: {} for appID in shardNotreleased}
+    for appID, value in shardNotreleased.items():
+      if appID not in games and value.get('checked', 0) >= notreleased.get(appID, {}).get('checked', 0):
+        notreleased[appID] = value
+
+  WriteJSONObject(discarded.items(), discardedFile)
+  WriteJSONObject(notreleased.items(), notreleasedFile)
+
+  return len(games), len(discarded), len(notreleased)
+
+if __name__ == "__main__":
+  print(f'Merge shards {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Merge the files of the shards of a scan (--shard K/N) in one dataset.')
+  parser.add_argument('-n', '--shards',   type=int, required=True,                 help='Number of shards (N)')
+  parser.add_argument('-g', '--games',    type=str, default=DEFAULT_OUTFILE,       help='Games file name or folder of shards, without the shard')
+  parser.add_argument('--discarded',      type=str, default=DISCARDED_FILE,        help='Discarded apps file name, without the shard')
+  parser.add_argument('--notreleased',    type=str, default=NOTRELEASED_FILE,      help='Not released apps file name, without the shard')
+  args = parser.parse_args()
+
+  files = []
+  for shard in range(1, args.shards + 1):
+    names = [ShardName(filename, (shard, args.shards)) for filename in (args.games, args.discarded, args.notreleased)]
+    if not os.path.exists(names[0]):
+      print(f"Shard file '{names[0]}' not found.")
+      sys.exit(1)
+    files.append(names)
+
+  games, discarded, notreleased = Merge(files, args.games, args.discarded, args.notreleased)
+  print(f'{games} games, {discarded} discarded, {notreleased} not released.')
@@ -0,0 +1,271 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import json
+import time
+import bisect
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_PREFIX   = 'scraper'
+DEFAULT_BUCKETS  = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_HOST     = '127.0.0.1'
+DEFAULT_INTERVAL = 10.0
+
+def Labels(labels):
+  '''
+  Labels as a sorted tuple of (name, value) text pairs, to be used as a key.
+  '''
+  return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def LabelText(labels, extra=()):
+  '''
+  Labels in Prometheus format: {endpoint="steam",status="200"}. Empty without labels.
+  '''
+  pairs = list(labels) + list(extra)
+  if len(pairs) == 0:
+    return ''
+
+  return '{' + ','.join(f'{name}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+                        for name, value in pairs) + '}'
+
+class Histogram:
+  '''
+  Count of the values under each bucket limit, their sum and their number.
+  '''
+  def __init__(self, buckets):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+    self.count = 0
+
+  def Observe(self, value):
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+    self.sum += value
+    self.count += 1
+
+  def Cumulative(self):
+    '''
+    (limit, count of values <= limit) pairs, ending with '+Inf'.
+    '''
+    total = 0
+    result = []
+    for limit, count in zip([f'{limit:g}' for limit in self.buckets] + ['+Inf'], self.counts):
+      total += count
+      result.append((limit, total))
+
+    return result
+
+class Metrics:
+  '''
+  Registry of counters and histograms with labels. Shared between threads. The times of the stages (sleeping,
+  fetching, parsing, saving...) are counters of seconds, added by every thread, so with several workers they can
+  be higher than the real time.
+  '''
+  def __init__(self, prefix=DEFAULT_PREFIX, buckets=DEFAULT_BUCKETS):
+    self.prefix = prefix
+    self.buckets = buckets
+    self.counters = {}
+    self.histograms = {}
+    self.descriptions = {}
+    self.started = time.time()
+    self.lock = threading.Lock()
+
+  def Describe(self, name, text):
+    '''
+    Help text of a metric.
+    '''
+    self.descriptions[name] = text
+
+  def Count(self, name, value=1, **labels):
+    '''
+    Add to a counter.
+    '''
+    key = (name, Labels(labels))
+    with self.lock:
+      self.counters[key] = self.counters.get(key, 0) + value
+
+  def Observe(self, name, value, **labels):
+    '''
+    Add a value to a histogram.
+    '''
+    key = (name, Labels(labels))
+    with self.lock:
+      if key not in self.histograms:
+        self.histograms[key] = Histogram(self.buckets)
+      self.histograms[key].Observe(value)
+
+  @contextlib.contextmanager
+  def Stage(self, stage):
+    '''
+    Add the time inside the block to the 'stage_seconds_total' counter of the stage.
+    '''
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.Count('stage_seconds_total', time.perf_counter() - start, stage=stage)
+
+  def Value(self, name, **labels):
+    '''
+    Current value of a counter, 0 if it has not been used.
+    '''
+    with self.lock:
+      return self.counters.get((name, Labels(labels)), 0)
+
+  def Total(self, name):
+    '''
+    Sum of a counter for all its labels.
+    '''
+    with self.lock:
+      return sum(value for (counter, labels), value in self.counters.items() if counter == name)
+
+  def Exposition(self):
+    '''
+    All the metrics in the Prometheus text format.
+    '''
+    with self.lock:
+      counters = sorted(self.counters.items())
+      histograms = sorted((key, histogram.Cumulative(), histogram.sum, histogram.count) for key, histogram in self.histograms.items())
+
+    lines = []
+    described = set()
+    def Header(name, kind):
+      if name not in described:
+        described.add(name)
+        if name in self.descriptions:
+          lines.append(f'# HELP {self.prefix}_{name} {self.descriptions[name]}')
+        lines.append(f'# TYPE {self.prefix}_{name} {kind}')
+
+    for (name, labels), value in counters:
+      Header(name, 'counter')
+      lines.append(f'{self.prefix}_{name}{LabelText(labels)} {value:g}')
+
+    for (name, labels), cumulative, total, count in histograms:
+      Header(name, 'histogram')
+      for limit, value in cumulative:
+        lines.append(f'{self.prefix}_{name}_bucket{LabelText(labels, [("le", limit)])} {value}')
+      lines.append(f'{self.prefix}_{name}_sum{LabelText(labels)} {total:g}')
+      lines.append(f'{self.prefix}_{name}_count{LabelText(labels)} {count}')
+
+    lines.append(f'# TYPE {self.prefix}_uptime_seconds gauge')
+    lines.append(f'{self.prefix}_uptime_seconds {time.time() - self.started:.3f}')
+
+    return '\n'.join(lines) + '\n'
+
+  def Snapshot(self):
+    '''
+    All the metrics as a dict: {'time', 'uptime', 'counters': {name: [{'labels', 'value'}]},
+    'histograms': {name: [{'labels', 'count', 'sum', 'buckets': {limit: count}}]}}.
+    '''
+    now = time.time()
+    snapshot = {'time': now, 'uptime': now - self.started, 'counters': {}, 'histograms': {}}
+    with self.lock:
+      for (name, labels), value in sorted(self.counters.items()):
+        snapshot['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+
+      for (name, labels), histogram in sorted(self.histograms.items()):
+        snapshot['histograms'].setdefault(name, []).append({'labels': dict(labels), 'count': histogram.count,
+                                                            'sum': histogram.sum, 'buckets': dict(histogram.Cumulative())})
+
+    return snapshot
+
+class MetricsServer:
+  '''
+  Local HTTP server in a background thread. '/metrics' returns the metrics in the Prometheus text format and
+  '/stats' as JSON.
+  '''
+  def __init__(self, metrics, port, host=DEFAULT_HOST):
+    class Handler(BaseHTTPRequestHandler):
+      def do_GET(self):
+        if self.path.startswith('/metrics'):
+          body = metrics.Exposition().encode('utf-8')
+          contentType = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.startswith('/stats'):
+          body = json.dumps(metrics.Snapshot()).encode('utf-8')
+          contentType = 'application/json'
+        else:
+          self.send_error(404)
+          return
+
+        self.send_response(200)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, format, *args):
+        pass
+
+    self.server = ThreadingHTTPServer((host, port), Handler)
+    self.server.daemon_threads = True
+    self.port = self.server.server_address[1]
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    self.thread.start()
+
+  def Stop(self):
+    self.server.shutdown()
+    self.server.server_close()
+
+class StatsWriter:
+  '''
+  Rewrites a JSON file with the metrics every 'interval' seconds, from a background thread. Besides the snapshot,
+  'rates' has the increase per second of each counter since the previous write. The file is replaced at once, so
+  it can be read at any time.
+  '''
+  def __init__(self, metrics, filename, interval=DEFAULT_INTERVAL):
+    self.metrics = metrics
+    self.filename = filename
+    self.interval = interval
+    self.previous = None
+    self.stop = threading.Event()
+    self.thread = threading.Thread(target=self.Run, daemon=True)
+    self.thread.start()
+
+  def Run(self):
+    while not self.stop.wait(self.interval):
+      self.Write()
+
+  def Write(self):
+    snapshot = self.metrics.Snapshot()
+    snapshot['rates'] = {}
+    if self.previous is not None and snapshot['time'] > self.previous['time']:
+      elapsed = snapshot['time'] - self.previous['time']
+      for name, values in snapshot['counters'].items():
+        before = {Labels(value['labels']): value['value'] for value in self.previous['counters'].get(name, [])}
+        snapshot['rates'][name] = [{'labels': value['labels'],
+                                    'value': (value['value'] - before.get(Labels(value['labels']), 0)) / elapsed}
+                                   for value in values]
+    self.previous = snapshot
+
+    with open(self.filename + '.tmp', 'w', encoding='utf-8') as fout:
+      json.dump(snapshot, fout, indent=4)
+    os.replace(self.filename + '.tmp', self.filename)
+
+  def Stop(self):
+    '''
+    Stop the thread and write the final metrics.
+    '''
+    self.stop.set()
+    self.thread.join()
+    self.Write()
@@ -1,17 +1,13 @@
 # Simple parse of the 'games.json' file.
 import os
-import json
+from GameShards import IterGames
 
-dataset = {}
-if os.path.exists('games.json'):
-  with open('games.json', 'r', encoding='utf-8') as fin:
-    text = fin.read()
-    if len(text) > 0:
-      dataset = json.loads(text)
+# Games are read one at a time, without loading the whole file.
+# 'games.json' can also be a folder of shards (GameShards.py).
+dataset = IterGames('games.json') if os.path.exists('games.json') else []
 
-for app in dataset:
+for app, game in dataset:
   appID = app                                         # AppID, unique identifier for each app (string).
-  game = dataset[app]             
 
   name = game['name']                                 # Game name (string).
   releaseDate = game['release_date']                  # Release date (string).
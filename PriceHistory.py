@@ -0,0 +1,193 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import json
+import time
+import array
+import argparse
+import SteamGamesScraper as scraper
+from StreamJSON import LoadKeys
+
+DEFAULT_HISTORY = 'prices'
+# Column name and array type code. Prices are stored in cents.
+COLUMNS = [('appid', 'I'), ('time', 'I'), ('initial', 'I'), ('final', 'I'), ('discount', 'B')]
+META_FILE = 'meta.json'
+
+class PriceHistory:
+  '''
+  Append-only price history of the apps in one currency. Each column is a file of fixed size values in a folder,
+  and a row is added only when the price of an app changes, so polling often does not grow the files.
+  '''
+  def __init__(self, folder=DEFAULT_HISTORY, currency=scraper.DEFAULT_CURRENCY):
+    self.folder = folder
+    os.makedirs(folder, exist_ok=True)
+
+    meta = {'currency': currency, 'byteorder': sys.byteorder, 'polls': []}
+    metaFile = os.path.join(folder, META_FILE)
+    if os.path.exists(metaFile):
+      with open(metaFile, 'r', encoding='utf-8') as fin:
+        meta = json.load(fin)
+      if meta['currency'] != currency:
+        raise ValueError(f"'{folder}' has prices in '{meta['currency']}', not in '{currency}'")
+    self.meta = meta
+
+    self.columns = {}
+    for name, typecode in COLUMNS:
+      values = array.array(typecode)
+      filename = self.Filename(name)
+      if os.path.exists(filename):
+        # After a crash the last value can be incomplete.
+        size = os.path.getsize(filename)
+        if size % values.itemsize != 0:
+          os.truncate(filename, size - size % values.itemsize)
+        with open(filename, 'rb') as fin:
+          values.frombytes(fin.read())
+        if meta['byteorder'] != sys.byteorder:
+          values.byteswap()
+      self.columns[name] = values
+
+    # And the last row can miss some columns.
+    rows = min(len(values) for values in self.columns.values())
+    for name, values in self.columns.items():
+      if len(values) > rows:
+        del values[rows:]
+        os.truncate(self.Filename(name), rows * values.itemsize)
+
+    self.index = None
+    self.last = {}
+    for row in range(rows):
+      self.last[self.columns['appid'][row]] = row
+
+  def Filename(self, name):
+    return os.path.join(self.folder, name + '.bin')
+
+  def __len__(self):
+    return len(self.columns['appid'])
+
+  def Append(self, prices, timestamp=None):
+    '''
+    Add the prices, {appID: {'initial', 'final', 'discount'}}, that are different from the last ones. Returns the
+    number of rows added.
+    '''
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    rows = {name: array.array(typecode) for name, typecode in COLUMNS}
+    for appID, price in prices.items():
+      appID = int(appID)
+      initial = round(price['initial'] * 100)
+      final = round(price['final'] * 100)
+      discount = int(price['discount'])
+      row = self.last.get(appID)
+      if row is not None and (self.columns['initial'][row], self.columns['final'][row], self.columns['discount'][row]) == (initial, final, discount):
+        continue
+
+      self.last[appID] = len(self) + len(rows['appid'])
+      for name, value in zip(('appid', 'time', 'initial', 'final', 'discount'), (appID, timestamp, initial, final, discount)):
+        rows[name].append(value)
+
+    if len(rows['appid']) > 0:
+      for name, values in rows.items():
+        with open(self.Filename(name), 'ab') as fout:
+          if self.meta['byteorder'] != sys.byteorder:
+            values.byteswap()
+            values.tofile(fout)
+            values.byteswap()
+          else:
+            values.tofile(fout)
+        self.columns[name].extend(values)
+      self.index = None
+
+    self.meta['polls'].append(timestamp)
+    with open(os.path.join(self.folder, META_FILE), 'w', encoding='utf-8') as fout:
+      json.dump(self.meta, fout)
+
+    return len(rows['appid'])
+
+  def Series(self, appID):
+    '''
+    Price changes of an app, a list of (time, initial, final, discount) sorted by time.
+    '''
+    if self.index is None:
+      self.index = {}
+      for row, app in enumerate(self.columns['appid']):
+        self.index.setdefault(app, []).append(row)
+
+    return [(self.columns['time'][row],
+             self.columns['initial'][row] / 100,
+             self.columns['final'][row] / 100,
+             self.columns['discount'][row]) for row in self.index.get(int(appID), [])]
+
+  def Apps(self):
+    '''
+    AppIDs with prices.
+    '''
+    return [str(appID) for appID in self.last]
+
+def Poll(history, appIDs, currency, retries):
+  '''
+  Request the current price of the apps, in requests of PRICE_BATCH apps, and add the changes to the history.
+  '''
+  appIDs = list(appIDs)
+  batches = [appIDs[i:i + scraper.PRICE_BATCH] for i in range(0, len(appIDs), scraper.PRICE_BATCH)]
+  prices = {}
+  try:
+    for count, batch in enumerate(batches, 1):
+      prices.update(scraper.PricesRequest(batch, currency, retries))
+      scraper.ProgressBar('Polling', count, len(batches), scraper.rates.Status())
+  except KeyboardInterrupt:
+    pass
+  print('\r')
+
+  return len(prices), history.Append(prices)
+
+if __name__ == "__main__":
+  scraper.Log(scraper.INFO, f'Steam price history {__version__} by {__author__}')
+  parser = argparse.ArgumentParser(description='Poll the prices of the games and keep their history.')
+  parser.add_argument('-f', '--folder',   type=str,   default=DEFAULT_HISTORY,           help='History folder')
+  parser.add_argument('-i', '--infile',   type=str,   default=scraper.DEFAULT_INFILE,    help='Poll the games of this dataset')
+  parser.add_argument('-a', '--applist',  action='store_true',                            help='Poll all the apps of the applist file instead')
+  parser.add_argument('-c', '--currency', type=str,   default=scraper.DEFAULT_CURRENCY,  help='Currency code')
+  parser.add_argument('-s', '--sleep',    type=float, default=scraper.DEFAULT_SLEEP,     help='Initial waiting time between requests')
+  parser.add_argument('-m', '--max-rate', type=float, default=scraper.DEFAULT_MAX_RATE,  help='Maximum requests per second')
+  parser.add_argument('-r', '--retries',  type=int,   default=scraper.DEFAULT_RETRIES,   help='Number of retries (0 to always retry)')
+  parser.add_argument('-g', '--game',     type=str,   default='',                        help='Print the price history of a game and exit')
+  args = parser.parse_args()
+
+  history = PriceHistory(args.folder, args.currency)
+  if args.game != '':
+    for timestamp, initial, final, discount in history.Series(args.game):
+      print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))} {final:>8.2f} {initial:>8.2f} {discount:>3}%")
+    sys.exit()
+
+  if args.applist:
+    appIDs = scraper.AppListGames(scraper.LoadAppList()).keys()
+  else:
+    appIDs = LoadKeys(args.infile)
+
+  if len(appIDs) == 0:
+    scraper.Log(scraper.ERROR, 'No apps to poll')
+    sys.exit(1)
+
+  scraper.rates.Configure(1.0 / args.sleep if args.sleep > 0 else args.max_rate, args.max_rate)
+  scraper.Log(scraper.INFO, f'Polling the prices of {len(appIDs)} apps in {args.currency}')
+  polled, changes = Poll(history, appIDs, args.currency, args.retries)
+  scraper.Log(scraper.INFO, f'{polled} prices received, {changes} changes added to the history ({len(history)} rows)')
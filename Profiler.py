@@ -0,0 +1,243 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+
+PROFILE_MODES    = ('spans', 'sample', 'cprofile')
+DEFAULT_OUTPUT   = 'profile'
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOP      = 20
+
+# Span used when profiling is off: nothing to measure.
+NO_SPAN = contextlib.nullcontext()
+
+class Span:
+  '''
+  Timed block. Its own time, without the time of the spans inside it, is added to the path of names of the open
+  spans of the thread.
+  '''
+  __slots__ = ('profiler', 'name', 'cpu', 'stack', 'start', 'children', 'profile')
+
+  def __init__(self, profiler, name, cpu):
+    self.profiler = profiler
+    self.name = name
+    self.cpu = cpu
+
+  def __enter__(self):
+    self.stack = self.profiler.Stack()
+    self.stack.append(self)
+    self.children = 0.0
+    self.profile = self.profiler.StartCPU() if self.cpu else None
+    self.start = time.perf_counter()
+
+    return self
+
+  def __exit__(self, *exception):
+    elapsed = time.perf_counter() - self.start
+    if self.profile is not None:
+      self.profile.disable()
+    path = ';'.join(span.name for span in self.stack)
+    if self.stack[-1] is self:
+      self.stack.pop()
+    else:
+      self.stack.remove(self)
+    if len(self.stack) > 0:
+      self.stack[-1].children += elapsed
+    self.profiler.Add(path, self.name, elapsed - self.children, elapsed)
+
+    return False
+
+class Profiler:
+  '''
+  Per-stage timing spans. In 'sample' mode a thread also samples the Python stacks of the threads inside a span,
+  and in 'cprofile' mode the CPU-bound spans are profiled with cProfile, one profile per thread. At exit, Write()
+  saves the stacks in the collapsed format (one 'a;b;c weight' line each), that flamegraph.pl and speedscope read.
+  '''
+  def __init__(self, mode='spans', interval=DEFAULT_INTERVAL):
+    if mode not in PROFILE_MODES:
+      raise ValueError(f"Unknown profile mode '{mode}'")
+
+    self.mode = mode
+    self.interval = interval
+    self.stacks = {}
+    self.spans = {}
+    self.totals = {}
+    self.samples = {}
+    self.profiles = {}
+    self.lock = threading.Lock()
+    self.sampler = None
+    self.stop = threading.Event()
+    if mode == 'sample':
+      self.sampler = threading.Thread(target=self.Sample, daemon=True)
+      self.sampler.start()
+
+  def Span(self, name, cpu=False):
+    '''
+    Span of a stage. 'cpu' marks the CPU-bound ones, profiled in 'cprofile' mode.
+    '''
+    return Span(self, name, cpu and self.mode == 'cprofile')
+
+  def Stack(self):
+    '''
+    Open spans of the current thread.
+    '''
+    ident = threading.get_ident()
+    stack = self.stacks.get(ident)
+    if stack is None:
+      stack = self.stacks[ident] = []
+
+    return stack
+
+  def StartCPU(self):
+    '''
+    Enable the cProfile of the current thread. None if it is already enabled by an outer span, or if the Python
+    version only allows one profiler at a time and another thread has it.
+    '''
+    if any(span.profile is not None for span in self.Stack()[:-1]):
+      return None
+
+    ident = threading.get_ident()
+    if ident not in self.profiles:
+      self.profiles[ident] = cProfile.Profile()
+    try:
+      self.profiles[ident].enable()
+    except ValueError:
+      return None
+
+    return self.profiles[ident]
+
+  def Add(self, path, name, own, elapsed):
+    with self.lock:
+      self.spans[path] = self.spans.get(path, 0.0) + own
+      count, total = self.totals.get(name, (0, 0.0))
+      self.totals[name] = (count + 1, total + elapsed)
+
+  def Sample(self):
+    '''
+    Every 'interval' seconds, count the Python stack of each thread with a span open, after the names of its spans.
+    '''
+    while not self.stop.wait(self.interval):
+      frames = sys._current_frames()
+      for ident, stack in list(self.stacks.items()):
+        frame = frames.get(ident)
+        if frame is None or len(stack) == 0:
+          continue
+
+        functions = []
+        while frame is not None:
+          code = frame.f_code
+          functions.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+          frame = frame.f_back
+
+        path = ';'.join([span.name for span in list(stack)] + functions[::-1])
+        self.samples[path] = self.samples.get(path, 0) + 1
+
+  def Summary(self, top=DEFAULT_TOP):
+    '''
+    Lines with the spans that took more time (calls, total and own seconds) and, with cProfile or the sampler, the
+    functions that took more time.
+    '''
+    own = {}
+    with self.lock:
+      for path, seconds in self.spans.items():
+        name = path.rsplit(';', 1)[-1]
+        own[name] = own.get(name, 0.0) + seconds
+      totals = sorted(self.totals.items(), key=lambda item: item[1][1], reverse=True)[:top]
+
+    lines = [f"{'Span':<24}{'Calls':>10}{'Total':>12}{'Own':>12}"]
+    for name, (count, total) in totals:
+      lines.append(f'{name:<24}{count:>10}{total:>11.3f}s{own.get(name, 0.0):>11.3f}s')
+
+    if self.mode == 'sample' and len(self.samples) > 0:
+      leaves = {}
+      for path, count in self.samples.items():
+        leaf = path.rsplit(';', 1)[-1]
+        leaves[leaf] = leaves.get(leaf, 0) + count
+      total = sum(leaves.values())
+      lines.append(f"{'Function (own samples)':<58}{'Samples':>10}{'%':>8}")
+      for leaf, count in sorted(leaves.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f'{leaf[:57]:<58}{count:>10}{100.0 * count / total:>7.1f}%')
+
+    stats = self.Stats()
+    if stats is not None:
+      functions = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+      lines.append(f"{'Function (own time)':<58}{'Calls':>10}{'Own':>12}")
+      for (filename, line, name), (calls, primitive, own, cumulative, callers) in functions:
+        function = f'{name} ({os.path.basename(filename)}:{line})'
+        lines.append(f'{function[:57]:<58}{calls:>10}{own:>11.3f}s')
+
+    return lines
+
+  def Stats(self):
+    '''
+    cProfile stats of all the threads, or None.
+    '''
+    profiles = [profile for profile in self.profiles.values() if profile.getstats()]
+    if len(profiles) == 0:
+      return None
+
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+      stats.add(profile)
+
+    return stats
+
+  def Write(self, output=DEFAULT_OUTPUT):
+    '''
+    Stop sampling and write '<output>.collapsed' with the spans (weights in microseconds). The sampler writes
+    '<output>-samples.collapsed' (weights in samples) and cProfile '<output>.prof', to read with pstats. Returns
+    the names of the files written.
+    '''
+    self.stop.set()
+    if self.sampler is not None:
+      self.sampler.join()
+
+    files = [output + '.collapsed']
+    with self.lock:
+      spans = sorted(self.spans.items())
+    WriteCollapsed(((path, round(seconds * 1e6)) for path, seconds in spans), files[0])
+
+    if self.mode == 'sample':
+      files.append(output + '-samples.collapsed')
+      WriteCollapsed(sorted(self.samples.items()), files[-1])
+
+    stats = self.Stats()
+    if stats is not None:
+      files.append(output + '.prof')
+      stats.dump_stats(files[-1])
+
+    return files
+
+def WriteCollapsed(stacks, filename):
+  '''
+  Write (path, weight) pairs in the collapsed stack format. Paths with weight 0 are skipped.
+  '''
+  with open(filename, 'w', encoding='utf-8') as fout:
+    for path, weight in stacks:
+      if weight > 0:
+        # The weight is after the last space, the names can have spaces.
+        fout.write(f'{path} {weight}\n')
@@ -0,0 +1,297 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import sys
+import gzip
+import json
+import time
+import zlib
+import shutil
+import hashlib
+import argparse
+from GameShards import IterGames
+
+MANIFEST_FILE   = 'manifest.json'
+CHANGELOG_FILE  = 'changelog.json'
+PUBLISH_FILE    = 'games-{0:03d}.jsonl.gz'
+DEFAULT_SHARDS  = 64
+DEFAULT_STAGING = 'publish.tmp'
+DEFAULT_MIRROR  = 'publish_kaggle'
+# Fields that change in every request, not in the content of a game.
+IGNORED_FIELDS  = {'fetched'}
+
+def RecordHash(game):
+  '''
+  Hash of the content of a game, without the IGNORED_FIELDS and independent of the order of its keys.
+  '''
+  content = {key: value for key, value in game.items() if key not in IGNORED_FIELDS}
+  text = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+  return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+def PublishShard(appID, shards):
+  '''
+  Shard of a game, always the same for the same appID.
+  '''
+  return zlib.crc32(appID.encode('utf-8')) % shards
+
+def ShardHash(records):
+  '''
+  Hash of a shard, from the appIDs and hashes of its games.
+  '''
+  digest = hashlib.blake2b(digest_size=16)
+  for appID in sorted(records, key=int):
+    digest.update(f'{appID}:{records[appID]}\n'.encode('ascii'))
+
+  return digest.hexdigest()
+
+class LocalTarget:
+  '''
+  Folder where the snapshots are published. Used to try the publication offline, and as the mirror of Kaggle.
+  '''
+  def __init__(self, folder):
+    self.folder = folder
+
+  def Read(self, name):
+    '''
+    Local path of a published file, or None.
+    '''
+    path = os.path.join(self.folder, name)
+    return path if os.path.exists(path) else None
+
+  def Upload(self, files, message):
+    '''
+    Publish files, {name: local path}, in one version.
+    '''
+    os.makedirs(self.folder, exist_ok=True)
+    for name, path in files.items():
+      shutil.copyfile(path, os.path.join(self.folder, name + '.tmp'))
+      os.replace(os.path.join(self.folder, name + '.tmp'), os.path.join(self.folder, name))
+
+class HuggingFaceTarget:
+  '''
+  Dataset repository in Hugging Face. Only the files given are uploaded, all of them in one commit.
+  '''
+  def __init__(self, repo):
+    from huggingface_hub import HfApi
+    self.api = HfApi()
+    self.repo = repo
+
+  def Read(self, name):
+    from huggingface_hub import hf_hub_download
+    from huggingface_hub.errors import EntryNotFoundError
+    try:
+      return hf_hub_download(self.repo, name, repo_type='dataset')
+    except EntryNotFoundError:
+      return None
+
+  def Upload(self, files, message):
+    from huggingface_hub import CommitOperationAdd
+    operations = [CommitOperationAdd(path_in_repo=name, path_or_fileobj=path) for name, path in files.items()]
+    self.api.create_commit(repo_id=self.repo, repo_type='dataset', operations=operations, commit_message=message)
+
+class KaggleTarget(LocalTarget):
+  '''
+  Kaggle dataset. Kaggle versions are uploaded whole, so the changed files are updated in a local mirror of the
+  dataset, and a new version is created from it.
+  '''
+  def __init__(self, dataset, mirror=DEFAULT_MIRROR):
+    super().__init__(mirror)
+    from kaggle.api.kaggle_api_extended import KaggleApi
+    self.api = KaggleApi()
+    self.api.authenticate()
+    self.dataset = dataset
+
+  def Upload(self, files, message):
+    '''
+    Update the mirror and create the version. If it fails, the previous manifest of the mirror is restored, so the
+    changes are published again the next time.
+    '''
+    manifest = os.path.join(self.folder, MANIFEST_FILE)
+    previous = None
+    if os.path.exists(manifest):
+      with open(manifest, 'rb') as fin:
+        previous = fin.read()
+
+    super().Upload(files, message)
+    metadata = os.path.join(self.folder, 'dataset-metadata.json')
+    if not os.path.exists(metadata):
+      with open(metadata, 'w', encoding='utf-8') as fout:
+        json.dump({'id': self.dataset}, fout)
+
+    try:
+      result = self.api.dataset_create_version(self.folder, version_notes=message, dir_mode='zip')
+      if result.error:
+        raise RuntimeError(f"Kaggle version not created: {result.error}")
+    except BaseException:
+      if previous is None:
+        os.remove(manifest)
+      else:
+        with open(manifest + '.tmp', 'wb') as fout:
+          fout.write(previous)
+        os.replace(manifest + '.tmp', manifest)
+      raise
+
+def Target(text, mirror=DEFAULT_MIRROR):
+  '''
+  Target of a text: 'hf:user/dataset', 'kaggle:user/dataset' or a local folder.
+  '''
+  if text.startswith('hf:'):
+    return HuggingFaceTarget(text[3:])
+  if text.startswith('kaggle:'):
+    return KaggleTarget(text[7:], mirror)
+
+  return LocalTarget(text)
+
+def LoadManifest(target):
+  path = target.Read(MANIFEST_FILE)
+  if path is None:
+    return None
+
+  with open(path, 'r', encoding='utf-8') as fin:
+    return json.load(fin)
+
+def ReadShard(target, name, appIDs):
+  '''
+  Games of a published shard that are in 'appIDs'.
+  '''
+  games = {}
+  path = target.Read(name)
+  if path is not None:
+    with gzip.open(path, 'rb') as fin:
+      for line in fin:
+        for appID, game in json.loads(line).items():
+          if appID in appIDs:
+            games[appID] = game
+
+  return games
+
+def Publish(filename, target, shards=DEFAULT_SHARDS, message='', staging=DEFAULT_STAGING, dryRun=False):
+  '''
+  Publish a snapshot of the dataset. The hashes of the games are compared with the manifest of the previous
+  snapshot, and only the shards with added, removed or modified games are written and uploaded, with the new
+  manifest and a changelog: the added and removed appIDs and the fields changed in each modified game. The dataset
+  is read twice, one game at a time. Returns the changelog.
+  '''
+  previous = LoadManifest(target)
+  if previous is not None and previous['shards_count'] != shards:
+    print(f"The previous snapshot has {previous['shards_count']} shards, using them.")
+    shards = previous['shards_count']
+  oldRecords = previous['records'] if previous is not None else {}
+
+  records = {}
+  for appID, game in IterGames(filename):
+    records[appID] = RecordHash(game)
+
+  shardRecords = [{} for _ in range(shards)]
+  for appID, digest in records.items():
+    shardRecords[PublishShard(appID, shards)][appID] = digest
+  oldShardRecords = [{} for _ in range(shards)]
+  for appID, digest in oldRecords.items():
+    oldShardRecords[PublishShard(appID, shards)][appID] = digest
+
+  names = [PUBLISH_FILE.format(shard) for shard in range(shards)]
+  hashes = [ShardHash(shardRecords[shard]) for shard in range(shards)]
+  changed = [shard for shard in range(shards)
+             if previous is None or previous['shards'].get(names[shard], {}).get('hash') != hashes[shard]]
+
+  added = sorted((appID for appID in records if appID not in oldRecords), key=int)
+  removed = sorted((appID for appID in oldRecords if appID not in records), key=int)
+  modified = sorted((appID for appID in records if appID in oldRecords and oldRecords[appID] != records[appID]), key=int)
+
+  # The previous version of the modified games, only from their shards, that have changed.
+  oldGames = {}
+  for shard in changed:
+    wanted = set(appID for appID in modified if appID in oldShardRecords[shard])
+    if len(wanted) > 0:
+      oldGames.update(ReadShard(target, names[shard], wanted))
+
+  if os.path.exists(staging):
+    shutil.rmtree(staging)
+  os.makedirs(staging)
+
+  files = {}
+  writers = {}
+  fields = {}
+  try:
+    if not dryRun:
+      for shard in changed:
+        files[names[shard]] = os.path.join(staging, names[shard])
+        writers[shard] = gzip.GzipFile(files[names[shard]], 'wb', mtime=0)
+
+    for appID, game in IterGames(filename):
+      shard = PublishShard(appID, shards)
+      if shard in writers:
+        writers[shard].write((json.dumps({appID: game}, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+      if appID in oldGames:
+        old = oldGames[appID]
+        fields[appID] = [key for key in dict.fromkeys(list(old) + list(game))
+                         if key not in IGNORED_FIELDS and old.get(key) != game.get(key)]
+  finally:
+    for writer in writers.values():
+      writer.close()
+
+  created = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+  changelog = {'created': created, 'previous': previous['created'] if previous is not None else None,
+               'games': len(records), 'added': added, 'removed': removed,
+               'modified': {appID: fields.get(appID, []) for appID in modified},
+               'shards': [names[shard] for shard in changed]}
+
+  if not dryRun and (len(changed) > 0 or previous is None):
+    manifest = {'created': created, 'games': len(records), 'shards_count': shards, 'shards': {}, 'records': records}
+    for shard in range(shards):
+      entry = previous['shards'].get(names[shard]) if previous is not None and shard not in changed else None
+      if entry is None:
+        entry = {'hash': hashes[shard], 'games': len(shardRecords[shard]), 'bytes': os.path.getsize(files[names[shard]])}
+      manifest['shards'][names[shard]] = entry
+
+    for name, data in [(CHANGELOG_FILE, changelog), (MANIFEST_FILE, manifest)]:
+      files[name] = os.path.join(staging, name)
+      with open(files[name], 'w', encoding='utf-8') as fout:
+        json.dump(data, fout, indent=4 if name == CHANGELOG_FILE else None, ensure_ascii=False)
+
+    # The manifest is the last file, a failed upload is published again the next time.
+    target.Upload(files, message or f'{len(added)} added, {len(removed)} removed, {len(modified)} modified')
+
+  shutil.rmtree(staging)
+
+  return changelog
+
+if __name__ == "__main__":
+  print(f'Publish the dataset {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Publish the changes of the dataset since the previous snapshot.')
+  parser.add_argument('-f', '--file',    type=str, default='games.json',     help='Dataset file name, or folder of shards')
+  parser.add_argument('-t', '--target',  type=str, required=True,            help="Where to publish: 'hf:user/dataset', 'kaggle:user/dataset' or a local folder")
+  parser.add_argument('-n', '--shards',  type=int, default=DEFAULT_SHARDS,   help='Number of shards of a new snapshot')
+  parser.add_argument('-m', '--message', type=str, default='',               help='Message of the version')
+  parser.add_argument('--mirror',        type=str, default=DEFAULT_MIRROR,   help='Local copy of the Kaggle dataset')
+  parser.add_argument('--dry-run',       action='store_true',                help='Only print the changes')
+  args = parser.parse_args()
+
+  if not os.path.exists(args.file):
+    print(f"Dataset '{args.file}' not found.")
+    sys.exit(1)
+
+  changelog = Publish(args.file, Target(args.target, args.mirror), args.shards, args.message, dryRun=args.dry_run)
+  print(f"{changelog['games']} games: {len(changelog['added'])} added, {len(changelog['removed'])} removed, "
+        f"{len(changelog['modified'])} modified. {len(changelog['shards'])} shards " +
+        ('would be uploaded.' if args.dry_run else 'uploaded.'))
@@ -0,0 +1,43 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import re
+import datetime as dt
+
+# Formats of the release dates in Steam, in the languages that write the month with letters.
+RELEASE_DATE_FORMATS = ['%b %d, %Y', '%d %b, %Y', '%d %b %Y', '%B %d, %Y', '%d %B, %Y', '%d %B %Y', '%b %Y', '%B %Y', '%Y']
+
+def ParseReleaseDate(text):
+  '''
+  Release date in text ('Oct 21, 2008', '21 Oct, 2008', 'Q4 2024', '2024'...) to date. None if it can not be parsed.
+  '''
+  text = re.sub(r'\bSept\b', 'Sep', text.strip().replace('.', ''))
+  for dateFormat in RELEASE_DATE_FORMATS:
+    try:
+      return dt.datetime.strptime(text, dateFormat).date()
+    except ValueError:
+      pass
+
+  quarter = re.fullmatch(r'Q([1-4]) (\d{4})', text)
+  if quarter:
+    return dt.date(int(quarter.group(2)), int(quarter.group(1)) * 3 - 2, 1)
+
+  return None
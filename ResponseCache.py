@@ -0,0 +1,142 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_FILE = 'cache.db'
+DEFAULT_CACHE_SIZE = 2048 # MB
+DEFAULT_CACHE_AGE  = 24   # Hours
+EVICT_BATCH        = 256
+
+class ResponseCache:
+  '''
+  Raw HTTP responses, compressed in a SQLite file. Bodies are stored by the hash of their content, so identical
+  responses are stored once. When the size limit is reached, the least recently used responses are evicted.
+  Responses younger than 'maxAge' seconds can be used without asking the server. Shared between threads.
+  '''
+  def __init__(self, filename=DEFAULT_CACHE_FILE, maxSize=DEFAULT_CACHE_SIZE * 1024 * 1024, maxAge=DEFAULT_CACHE_AGE * 3600):
+    self.filename = filename
+    self.maxSize = maxSize
+    self.maxAge = maxAge
+    self.lock = threading.Lock()
+    self.connection = sqlite3.connect(filename, isolation_level=None, check_same_thread=False)
+    self.connection.execute('PRAGMA journal_mode=WAL')
+    self.connection.execute('PRAGMA synchronous=NORMAL')
+    self.connection.execute('CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL)')
+    self.connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, hash TEXT NOT NULL, etag TEXT, '
+                            'last_modified TEXT, fetched REAL NOT NULL, used REAL NOT NULL)')
+    self.connection.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+    self.connection.execute('CREATE INDEX IF NOT EXISTS responses_hash ON responses (hash)')
+    self.size = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
+  def Get(self, key):
+    '''
+    Cached response: dict with 'body', 'etag', 'last_modified' and 'fetched' (time), or None.
+    '''
+    with self.lock:
+      row = self.connection.execute('SELECT r.etag, r.last_modified, r.fetched, b.data FROM responses r '
+                                    'JOIN blobs b ON b.hash = r.hash WHERE r.key = ?', (key,)).fetchone()
+      if row is None:
+        return None
+
+      self.connection.execute('UPDATE responses SET used = ? WHERE key = ?', (time.time(), key))
+
+    return {'etag': row[0], 'last_modified': row[1], 'fetched': row[2], 'body': zlib.decompress(row[3]).decode('utf-8')}
+
+  def Put(self, key, body, etag=None, lastModified=None):
+    '''
+    Store a response.
+    '''
+    data = body.encode('utf-8')
+    digest = hashlib.sha1(data).hexdigest()
+    now = time.time()
+    with self.lock:
+      if self.connection.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone() is None:
+        compressed = zlib.compress(data, 6)
+        self.connection.execute('INSERT INTO blobs (hash, data, size) VALUES (?, ?, ?)', (digest, compressed, len(compressed)))
+        self.size += len(compressed)
+
+      previous = self.connection.execute('SELECT hash FROM responses WHERE key = ?', (key,)).fetchone()
+      self.connection.execute('INSERT INTO responses (key, hash, etag, last_modified, fetched, used) VALUES (?, ?, ?, ?, ?, ?) '
+                              'ON CONFLICT(key) DO UPDATE SET hash = excluded.hash, etag = excluded.etag, '
+                              'last_modified = excluded.last_modified, fetched = excluded.fetched, used = excluded.used',
+                              (key, digest, etag, lastModified, now, now))
+      if previous is not None and previous[0] != digest:
+        self.DeleteOrphan(previous[0])
+
+      if self.size > self.maxSize:
+        self.Evict()
+
+  def Touch(self, key):
+    '''
+    The cached response has been revalidated by the server.
+    '''
+    now = time.time()
+    with self.lock:
+      self.connection.execute('UPDATE responses SET fetched = ?, used = ? WHERE key = ?', (now, now, key))
+
+  def Items(self, pattern='%'):
+    '''
+    Yields (key, body, fetched) of the responses whose key matches a LIKE pattern.
+    '''
+    with self.lock:
+      keys = [row[0] for row in self.connection.execute('SELECT key FROM responses WHERE key LIKE ? ORDER BY key', (pattern,))]
+
+    for key in keys:
+      with self.lock:
+        row = self.connection.execute('SELECT r.fetched, b.data FROM responses r JOIN blobs b ON b.hash = r.hash '
+                                      'WHERE r.key = ?', (key,)).fetchone()
+      if row is not None:
+        yield key, zlib.decompress(row[1]).decode('utf-8'), row[0]
+
+  def DeleteOrphan(self, digest):
+    if self.connection.execute('SELECT 1 FROM responses WHERE hash = ?', (digest,)).fetchone() is None:
+      row = self.connection.execute('SELECT size FROM blobs WHERE hash = ?', (digest,)).fetchone()
+      if row is not None:
+        self.connection.execute('DELETE FROM blobs WHERE hash = ?', (digest,))
+        self.size -= row[0]
+
+  def Evict(self):
+    '''
+    Remove the least recently used responses until the cache fits in 90% of its size.
+    '''
+    while self.size > self.maxSize * 0.9:
+      rows = self.connection.execute('SELECT key, hash FROM responses ORDER BY used LIMIT ?', (EVICT_BATCH,)).fetchall()
+      if len(rows) == 0:
+        break
+
+      self.connection.execute('BEGIN')
+      for key, digest in rows:
+        self.connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+        self.DeleteOrphan(digest)
+      self.connection.execute('COMMIT')
+
+  def __len__(self):
+    with self.lock:
+      return self.connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+  def Close(self):
+    with self.lock:
+      self.connection.close()
@@ -0,0 +1,180 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import json
+import sqlite3
+import argparse
+from collections.abc import MutableMapping
+
+DEFAULT_DATABASE = 'games.db'
+
+class Table(MutableMapping):
+  '''
+  Dictionary view of a table indexed by appID. Values are stored as JSON.
+  '''
+  def __init__(self, connection, name):
+    self.connection = connection
+    self.name = name
+    connection.execute(f'CREATE TABLE IF NOT EXISTS {name} (appid TEXT PRIMARY KEY, data TEXT NOT NULL)')
+
+  def __getitem__(self, appID):
+    row = self.connection.execute(f'SELECT data FROM {self.name} WHERE appid = ?', (appID,)).fetchone()
+    if row is None:
+      raise KeyError(appID)
+    return json.loads(row[0])
+
+  def __setitem__(self, appID, value):
+    # Upsert keeps the rowid, so the export keeps the insertion order like a dict.
+    self.connection.execute(f'INSERT INTO {self.name} (appid, data) VALUES (?, ?) '
+                            'ON CONFLICT(appid) DO UPDATE SET data = excluded.data',
+                            (appID, json.dumps(value, ensure_ascii=False)))
+
+  def __delitem__(self, appID):
+    if self.connection.execute(f'DELETE FROM {self.name} WHERE appid = ?', (appID,)).rowcount == 0:
+      raise KeyError(appID)
+
+  def __contains__(self, appID):
+    return self.connection.execute(f'SELECT 1 FROM {self.name} WHERE appid = ?', (appID,)).fetchone() is not None
+
+  def __iter__(self):
+    for row in self.connection.execute(f'SELECT appid FROM {self.name} ORDER BY rowid'):
+      yield row[0]
+
+  def __len__(self):
+    return self.connection.execute(f'SELECT COUNT(*) FROM {self.name}').fetchone()[0]
+
+  def items(self):
+    '''
+    Stream (appID, value) pairs with a single query.
+    '''
+    for appID, data in self.connection.execute(f'SELECT appid, data FROM {self.name} ORDER BY rowid'):
+      yield appID, json.loads(data)
+
+  def RawItems(self):
+    '''
+    Stream (appID, JSON text) pairs, without decoding the values.
+    '''
+    yield from self.connection.execute(f'SELECT appid, data FROM {self.name} ORDER BY rowid')
+
+  def Update(self, data):
+    '''
+    Insert many values in one statement.
+    '''
+    self.connection.executemany(f'INSERT INTO {self.name} (appid, data) VALUES (?, ?) '
+                                'ON CONFLICT(appid) DO UPDATE SET data = excluded.data',
+                                ((appID, json.dumps(value, ensure_ascii=False)) for appID, value in data.items()))
+
+class GameDatabase:
+  '''
+  SQLite store of the games, discarded apps and not released apps. Changes are grouped in transactions until
+  Commit() is called.
+  '''
+  def __init__(self, filename=DEFAULT_DATABASE):
+    self.filename = filename
+    self.connection = sqlite3.connect(filename)
+    self.connection.execute('PRAGMA journal_mode=WAL')
+    self.connection.execute('PRAGMA synchronous=NORMAL')
+    self.games = Table(self.connection, 'games')
+    self.discarded = Table(self.connection, 'discarded')
+    # The not released apps were only a list of appIDs.
+    if [row[1] for row in self.connection.execute('PRAGMA table_info(notreleased)')] == ['appid']:
+      self.connection.execute("ALTER TABLE notreleased ADD COLUMN data TEXT NOT NULL DEFAULT '{}'")
+    self.notreleased = Table(self.connection, 'notreleased')
+    self.connection.commit()
+
+  def Empty(self):
+    return len(self.games) == 0 and len(self.discarded) == 0 and len(self.notreleased) == 0
+
+  def Import(self, dataset, notreleased, discarded):
+    '''
+    Add the contents of the JSON files.
+    '''
+    self.games.Update(dataset)
+    self.discarded.Update(discarded)
+    self.notreleased.Update(notreleased)
+    self.Commit()
+
+  def Export(self, gamesFile, discardedFile, notreleasedFile):
+    '''
+    Write the JSON files with the same format as SaveJSON, one record at a time.
+    '''
+    WriteJSONObject(self.games.items(), gamesFile)
+    WriteJSONObject(self.discarded.items(), discardedFile)
+    WriteJSONObject(self.notreleased.items(), notreleasedFile)
+
+  def Commit(self):
+    self.connection.commit()
+
+  def Close(self):
+    self.connection.commit()
+    self.connection.close()
+
+def WriteJSONObject(items, filename):
+  '''
+  Write (key, value) pairs as a JSON object, same output as json.dumps(dict(items), indent=4).
+  '''
+  with open(filename, 'w', encoding='utf-8') as fout:
+    separator = '{\n    '
+    for key, value in items:
+      fout.write(separator + json.dumps(key, ensure_ascii=False) + ': ' +
+                 json.dumps(value, indent=4, ensure_ascii=False).replace('\n', '\n    '))
+      separator = ',\n    '
+
+    fout.write('{}' if separator == '{\n    ' else '\n}')
+
+def LoadFile(filename, default):
+  if os.path.exists(filename):
+    with open(filename, 'r', encoding='utf-8') as fin:
+      text = fin.read()
+      if len(text) > 0:
+        return json.loads(text)
+
+  return default
+
+if __name__ == "__main__":
+  print(f'Steam games database {__version__} by {__author__}.')
+  parser = argparse.ArgumentParser(description='Import or export the SQLite games database.')
+  parser.add_argument('-d', '--database',    type=str, default=DEFAULT_DATABASE,   help='Database file name')
+  parser.add_argument('-g', '--games',       type=str, default='games.json',       help='Games JSON file name')
+  parser.add_argument('--discarded',         type=str, default='discarded.json',   help='Discarded apps JSON file name')
+  parser.add_argument('--notreleased',       type=str, default='notreleased.json', help='Not released apps JSON file name')
+  group = parser.add_mutually_exclusive_group(required=True)
+  group.add_argument('--import', dest='importJSON', action='store_true', help='Import the JSON files into the database')
+  group.add_argument('--export', dest='exportJSON', action='store_true', help='Export the database to the JSON files')
+  args = parser.parse_args()
+
+  database = GameDatabase(args.database)
+  if args.importJSON:
+    discarded = LoadFile(args.discarded, {})
+    if isinstance(discarded, list):
+      discarded = {appID: {'name': 'Unknown', 'reason': 'legacy'} for appID in discarded}
+
+    notreleased = LoadFile(args.notreleased, {})
+    if isinstance(notreleased, list):
+      notreleased = {appID: {} for appID in notreleased}
+
+    database.Import(LoadFile(args.games, {}), notreleased, discarded)
+  else:
+    database.Export(args.games, args.discarded, args.notreleased)
+
+  print(f'{len(database.games)} games, {len(database.discarded)} discarded, {len(database.notreleased)} not released.')
+  database.Close()
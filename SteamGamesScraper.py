@@ -30,7 +30,24 @@ import traceback
 import argparse
 import random
 import datetime as dt
+import math
+import zlib
+import email.utils
 import csv
+import asyncio
+import threading
+import itertools
+import contextlib
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections.abc import MutableMapping
+from SteamDatabase import GameDatabase, WriteJSONObject
+from GameRecords import CompactDataset
+from ReleaseDate import ParseReleaseDate
+from GameShards import IsShards, IsShardsName, WriteShards, IterGames, IterGameKeys, FindGame
+from ResponseCache import ResponseCache, DEFAULT_CACHE_SIZE, DEFAULT_CACHE_AGE
+from Metrics import Metrics, MetricsServer, StatsWriter, DEFAULT_INTERVAL
+from Profiler import Profiler, PROFILE_MODES, NO_SPAN, DEFAULT_OUTPUT as DEFAULT_PROFILE
 
 # Initialize a global session for connection pooling
 session = requests.Session()
@@ -40,12 +57,42 @@ DEFAULT_OUTFILE  = 'games.json'
 APPLIST_FILE     = 'applist.json'
 DISCARDED_FILE   = 'discarded.json'
 NOTRELEASED_FILE = 'notreleased.json'
+JOURNAL_EXT      = '.journal'
+QUEUE_EXT        = '.queue'
+CURSOR_EXT       = '.cursor'
+MAX_ATTEMPTS     = 3
+STEAMSPY_FILE    = 'steamspy.json'
 DEFAULT_SLEEP    = 1.5
 DEFAULT_RETRIES  = 4
 DEFAULT_AUTOSAVE = 100
 DEFAULT_TIMEOUT  = 10
 DEFAULT_CURRENCY = 'us'
 DEFAULT_LANGUAGE = 'en'
+DEFAULT_WORKERS  = 0
+DEFAULT_PARSERS  = 0
+DEFAULT_MAX_RATE = 200 / 300 # Steam allows 200 requests every five minutes.
+DEFAULT_BACKOFF  = 5
+DEFAULT_RETRY_AFTER = 60
+MIN_RATE         = 0.05
+MAX_BACKOFF      = 500
+RATE_INCREASE    = 0.01
+RATE_DECREASE    = 0.5
+STEAM_APPDETAILS_URL = 'https://store.steampowered.com/api/appdetails/'
+STEAM_APPLIST_URL    = 'https://api.steampowered.com/IStoreService/GetAppList/v1/'
+# Types of apps in GetAppList and the filter that includes each one.
+APP_TYPES            = {'game': 'include_games', 'dlc': 'include_dlc', 'software': 'include_software',
+                        'video': 'include_videos', 'hardware': 'include_hardware'}
+DEFAULT_APP_TYPES    = 'game'
+STEAMSPY_API_URL     = 'https://steamspy.com/api.php'
+STEAMSPY_ALL_RATE     = 1.0 / 60
+STEAMSPY_CACHE_TTL    = 86400
+DEFAULT_REFRESH_LIMIT = 0
+REFRESH_NOTRELEASED   = 4.0
+NOTRELEASED_BACKOFF   = 1.0  # Days
+NOTRELEASED_MAX_BACKOFF = 30.0 # Days
+PRICE_BATCH           = 100
+PARSE_BATCH           = 256
+PROGRESS_INTERVAL     = 0.25
 LOG_ICON         = ['i', 'W', 'E', '!']
 INFO             = 0
 WARNING          = 1
@@ -58,36 +105,56 @@ def Log(level, message):
   '''
   print(f"[{LOG_ICON[level]} {dt.datetime.now().strftime('%H:%M:%S')}] {message}")
 
-def ProgressBar(title, count, total):
+# Time of the last progress bar drawn
+progressTime = 0.0
+
+def ProgressBar(title, count, total, status=''):
   '''
-  Displays and updates a progress bar.
+  Displays and updates a progress bar, with an optional status text. It is drawn at most every PROGRESS_INTERVAL
+  seconds, and always when it is complete.
   '''
+  global progressTime
+  now = time.monotonic()
+  if count < total and now - progressTime < PROGRESS_INTERVAL:
+    return
+  progressTime = now
+
   bar_len = 75
   filled_len = int(round(bar_len * count / float(total)))
 
   percents = round(100.0 * count / float(total), 2)
   bar = '█' * filled_len + '░' * (bar_len - filled_len)
 
-  sys.stdout.write(f"[i {dt.datetime.now().strftime('%H:%M:%S')}] {title} {bar} {percents}% (CTRL+C to exit). \r")
+  sys.stdout.write(f"[i {dt.datetime.now().strftime('%H:%M:%S')}] {title} {bar} {percents}% {status + ' ' if status else ''}(CTRL+C to exit). \r")
   sys.stdout.flush()
 
+# Profiler of the stages, if enabled
+profiler = None
+
+def Span(name, cpu=False):
+  '''
+  Profiling span of a stage, 'cpu' if it is CPU-bound. Does nothing if profiling is off.
+  '''
+  return profiler.Span(name, cpu) if profiler is not None else NO_SPAN
+
 def SanitizeText(text):
   '''
   Removes HTML codes, escape codes and URLs.
   '''
-  text = text.replace('\n\r', ' ')
-  text = text.replace('\r\n', ' ')
-  text = text.replace('\r \n', ' ')
-  text = text.replace('\r', ' ')
-  text = text.replace('\n', ' ')
-  text = text.replace('\t', ' ')
-  text = text.replace('&quot;', "'")
-  text = re.sub(r'(https|http)?:\/\/(\w|\.|\/|\?|\=|\&|\%)*\b', '', text, flags=re.MULTILINE)
-  text = re.sub('<[^<]+?>', ' ', text)
-  text = re.sub(' +', ' ', text)
-  text = text.lstrip(' ')
-
-  return text
+  with Span('sanitize', True):
+    text = text.replace('\n\r', ' ')
+    text = text.replace('\r\n', ' ')
+    text = text.replace('\r \n', ' ')
+    text = text.replace('\r', ' ')
+    text = text.replace('\n', ' ')
+    text = text.replace('\t', ' ')
+    text = text.replace('&quot;', "'")
+    text = re.sub(r'(https|http)?:\/\/(\w|\.|\/|\?|\=|\&|\%)*\b', '', text, flags=re.MULTILINE)
+    text = re.sub('<[^<]+?>', ' ', text)
+    text = re.sub(' +', ' ', text)
+    text = text.lstrip(' ')
+
+    return text
 
 def PriceToFloat(price, decimals=2):
   '''
@@ -97,90 +164,360 @@ def PriceToFloat(price, decimals=2):
 
   return round(float(re.findall('([0-9]+[,.]+[0-9]+)', price)[0]), decimals)
 
-def DoRequest(url, parameters=None, retryTime=5, successCount=0, errorCount=0, retries=0):
+class TokenBucket:
   '''
-  Makes a Web request. If an error occurs, retry.
+  Token bucket of an endpoint. The rate grows additively while the responses are OK and is cut multiplicatively
+  on 429 or 5xx, waiting the 'Retry-After' time if the server sends it. Shared between threads.
   '''
-  response = None
-  try:
-    response = session.get(url=url, params=parameters, timeout=DEFAULT_TIMEOUT)
-  except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError,
-          requests.exceptions.Timeout, requests.exceptions.RequestException,
-          SSLError) as ex:
-    Log(EXCEPTION, f'An exception of type {type(ex).__name__} occurred.')
-    response = None
+  def __init__(self, name, rate, maxRate, fixed=False):
+    self.name = name
+    self.rate = rate
+    self.maxRate = maxRate
+    self.fixed = fixed
+    self.tokens = 1.0
+    self.updated = time.monotonic()
+    self.blockedUntil = 0.0
+    self.backoff = DEFAULT_BACKOFF
+    self.lock = threading.Lock()
+
+  def Acquire(self):
+    '''
+    Blocks until a request can be sent.
+    '''
+    while True:
+      with self.lock:
+        now = time.monotonic()
+        self.tokens = min(1.0, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = self.blockedUntil - now
+        if wait <= 0:
+          if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return
+          wait = (1.0 - self.tokens) / self.rate
+
+      time.sleep(wait)
+
+  def Success(self):
+    '''
+    Additive increase.
+    '''
+    with self.lock:
+      self.rate = min(self.maxRate, self.rate + RATE_INCREASE)
+      self.backoff = DEFAULT_BACKOFF
+
+  def Throttle(self, wait=None):
+    '''
+    Multiplicative decrease. Blocks the endpoint 'wait' seconds, or the current backoff, that grows with each call.
+    Returns the seconds blocked.
+    '''
+    with self.lock:
+      self.rate = max(MIN_RATE, self.rate * RATE_DECREASE)
+      if wait is None:
+        wait = self.backoff
+        self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+      self.tokens = 0.0
+      self.blockedUntil = max(self.blockedUntil, time.monotonic() + wait)
+
+    return wait
+
+  def Status(self):
+    '''
+    Current rate and backoff, as text.
+    '''
+    wait = self.blockedUntil - time.monotonic()
+    return f'{self.name} {self.rate:.2f}/s' + (f' (wait {wait:.0f}s)' if wait > 0 else '')
+
+class RateController:
+  '''
+  One token bucket per endpoint.
+  '''
+  def __init__(self, rate, maxRate):
+    self.rate = rate
+    self.maxRate = maxRate
+    self.buckets = {}
+    self.lock = threading.Lock()
+
+  def Configure(self, rate, maxRate):
+    '''
+    Change the initial and the maximum rate.
+    '''
+    with self.lock:
+      self.rate = rate
+      self.maxRate = max(rate, maxRate)
+      for bucket in self.buckets.values():
+        if not bucket.fixed:
+          bucket.maxRate = self.maxRate
+          bucket.rate = min(bucket.rate, self.maxRate)
+
+  def Bucket(self, endpoint, rate=None):
+    '''
+    Bucket of an endpoint. With 'rate' it is created with that maximum rate, that Configure does not change.
+    '''
+    with self.lock:
+      if endpoint not in self.buckets:
+        if rate is None:
+          self.buckets[endpoint] = TokenBucket(endpoint, self.rate, self.maxRate)
+        else:
+          self.buckets[endpoint] = TokenBucket(endpoint, rate, rate, True)
+      return self.buckets[endpoint]
 
-  if response and response.status_code == 200:
-    errorCount = 0
-    successCount += 1
-    if successCount > retryTime:
-      retryTime = max(1.5, retryTime / 2)
-      successCount = 0
-  elif response and response.status_code == 429:
-    # Too Many Requests - back off significantly
-    retryTime = 60 
-    Log(WARNING, f'Rate limit exceeded (429). Waiting {retryTime} seconds...')
-    time.sleep(retryTime)
-    return DoRequest(url, parameters, retryTime, successCount, errorCount, retries)
-  else:
-    if retries == 0 or errorCount < retries:
+  def Status(self):
+    return ', '.join(bucket.Status() for bucket in list(self.buckets.values()))
+
+# Shared rate controller for all the endpoints
+rates = RateController(1.0 / DEFAULT_SLEEP, DEFAULT_MAX_RATE)
+
+# Cache of the raw Steam responses, if enabled
+cache = None
+
+# Counters and timings of the requests, the stages and the results
+metrics = Metrics()
+metrics.Describe('requests_total', 'Requests by endpoint and HTTP status (error if there was no response)')
+metrics.Describe('request_seconds', 'Duration of the requests by endpoint and HTTP status')
+metrics.Describe('throttled_total', 'Times an endpoint has been throttled, by reason')
+metrics.Describe('cache_total', 'Steam responses by cache result: hit, revalidated, miss')
+metrics.Describe('apps_total', 'Requested apps by result: added, refreshed, notreleased, rechecked, discarded')
+metrics.Describe('stage_seconds_total', 'Seconds spent in each stage (sleep, fetch, parse, save), added by all the threads')
+
+def RetryAfter(response):
+  '''
+  Seconds to wait from the 'Retry-After' header, in seconds or as a HTTP date. None if there is not.
+  '''
+  value = response.headers.get('Retry-After')
+  if value:
+    try:
+      return max(0.0, float(value))
+    except ValueError:
+      try:
+        date = email.utils.parsedate_to_datetime(value)
+        return max(0.0, (date - dt.datetime.now(dt.timezone.utc)).total_seconds())
+      except (TypeError, ValueError):
+        pass
+
+  return None
+
+def DoRequest(url, parameters=None, retries=0, endpoint='default', headers=None):
+  '''
+  Makes a Web request, respecting the rate of the endpoint. If an error occurs, retry.
+  '''
+  bucket = rates.Bucket(endpoint)
+  errorCount = 0
+  while True:
+    with metrics.Stage('sleep'), Span(endpoint + ' wait'):
+      bucket.Acquire()
+
+    response = None
+    start = time.perf_counter()
+    try:
+      with metrics.Stage('fetch'), Span(endpoint + ' request'):
+        response = session.get(url=url, params=parameters, headers=headers, timeout=DEFAULT_TIMEOUT)
+    except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout, requests.exceptions.RequestException,
+            SSLError) as ex:
+      Log(EXCEPTION, f'An exception of type {type(ex).__name__} occurred.')
+      response = None
+
+    status = response.status_code if response is not None else 'error'
+    metrics.Count('requests_total', endpoint=endpoint, status=status)
+    metrics.Observe('request_seconds', time.perf_counter() - start, endpoint=endpoint, status=status)
+
+    if response is not None and response.status_code in (200, 304):
+      bucket.Success()
+      return response
+    elif response is not None and response.status_code == 429:
+      # Too Many Requests - back off significantly
+      retryAfter = RetryAfter(response)
+      wait = bucket.Throttle(retryAfter if retryAfter is not None else DEFAULT_RETRY_AFTER)
+      metrics.Count('throttled_total', endpoint=endpoint, reason='429')
+      Log(WARNING, f'Rate limit exceeded (429). Waiting {wait:.0f} seconds...')
+    elif response is not None and response.status_code < 500:
+      # Other client errors do not mean that the server is overloaded, and they will not change retrying.
+      Log(WARNING, f'HTTP {response.status_code} {response.reason}, not retrying')
+      return None
+    elif retries == 0 or errorCount < retries:
       errorCount += 1
-      successCount = 0
-      retryTime = min(retryTime * 2, 500)
+      retryAfter = RetryAfter(response) if response is not None else None
+      wait = bucket.Throttle(retryAfter)
+      metrics.Count('throttled_total', endpoint=endpoint, reason='error')
       if response is not None:
-        Log(WARNING, f'HTTP {response.status_code} {response.reason}, retrying in {retryTime} seconds')
+        Log(WARNING, f'HTTP {response.status_code} {response.reason}, retrying in {wait:.0f} seconds')
       else:
-        Log(WARNING, f'Request failed, retrying in {retryTime} seconds.')
-
-      time.sleep(retryTime)
-
-      return DoRequest(url, parameters, retryTime, successCount, errorCount, retries)
+        Log(WARNING, f'Request failed, retrying in {wait:.0f} seconds.')
     else:
       Log(ERROR, 'No more retries available. Saving and exiting.')
       sys.exit()
 
-  return response
+def SteamRequest(appID, retries, currency=DEFAULT_CURRENCY, language=DEFAULT_LANGUAGE):
+  '''
+  Request and parse information about a Steam app. With the response cache, recent responses are not requested
+  again and older ones are revalidated with the server.
+  '''
+  key = f'appdetails/{appID}/{currency}/{language}'
+  cached = cache.Get(key) if cache is not None else None
+  response = None
+  if cached is not None and time.time() - cached['fetched'] < cache.maxAge:
+    metrics.Count('cache_total', result='hit')
+    text = cached['body']
+  else:
+    headers = {}
+    if cached is not None:
+      if cached['etag']:
+        headers['If-None-Match'] = cached['etag']
+      if cached['last_modified']:
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    response = DoRequest(STEAM_APPDETAILS_URL, {"appids": appID, "cc": currency, "l": language}, retries, 'steam', headers)
+    if not response:
+      Log(ERROR, 'Bad response')
+      return None, 'bad_response', 'Unknown'
+
+    if response.status_code == 304 and cached is not None:
+      metrics.Count('cache_total', result='revalidated')
+      cache.Touch(key)
+      text = cached['body']
+    else:
+      if cache is not None:
+        metrics.Count('cache_total', result='miss')
+      text = response.text
+
+  try:
+    with metrics.Stage('parse'), Span('decode', True):
+      result = ParseAppDetails(appID, json.loads(text))
+    # Only valid responses are cached.
+    if cache is not None and response is not None and response.status_code == 200:
+      cache.Put(key, text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    return result
+  except Exception as ex:
+    Log(EXCEPTION, f'An exception of type {ex} occurred. Traceback: {traceback.format_exc()}')
+    return None, 'exception', 'Unknown'
+
+def ParseAppDetails(appID, data):
+  '''
+  Check the appdetails response of an app. Returns the app data (None if it is discarded), the reason and the name.
+  '''
+  app = data[appID]
+  if app['success'] == False:
+    return None, 'no_success', 'Unknown'
+
+  app_data = app['data']
+  name = app_data.get('name', 'Unknown')
+
+  if app_data.get('type') != 'game':
+    return None, app_data.get('type', 'not_game'), name
+  elif app_data.get('is_free') == False and 'price_overview' in app_data and app_data['price_overview'].get('final_formatted') == '':
+    return None, 'no_price', name
+  elif 'developers' in app_data and len(app_data['developers']) == 0:
+    return None, 'no_developer', name
+  else:
+    return app_data, 'ok', name
+
+def PriceOverview(price):
+  '''
+  Price of a 'price_overview': currency, initial and final price and discount.
+  '''
+  return {'currency': price['currency'],
+          'initial': round(float(price['initial']) * 0.01, 2),
+          'final': round(float(price['final']) * 0.01, 2),
+          'discount': price['discount_percent']}
 
-def SteamRequest(appID, retryTime, successRequestCount, errorRequestCount, retries, currency=DEFAULT_CURRENCY, language=DEFAULT_LANGUAGE):
+def PricesRequest(appIDs, currency, retries):
   '''
-  Request and parse information about a Steam app.
+  Request the price of many apps in a region at once, only with the 'price_overview' of appdetails. Returns
+  {appID: price}, without the free apps and those not sold in the region.
   '''
-  url = "https://store.steampowered.com/api/appdetails/"
-  response = DoRequest(url, {"appids": appID, "cc": currency, "l": language}, retryTime, successRequestCount, errorRequestCount, retries)
+  prices = {}
+  response = DoRequest(STEAM_APPDETAILS_URL, {'appids': ','.join(appIDs), 'cc': currency, 'filters': 'price_overview'}, retries, 'steam')
   if response:
     try:
-      data = response.json()
-      app = data[appID]
-      if app['success'] == False:
-        return None, 'no_success', 'Unknown'
-      
-      app_data = app['data']
-      name = app_data.get('name', 'Unknown')
-      
-      if app_data.get('type') != 'game':
-        return None, app_data.get('type', 'not_game'), name
-      elif app_data.get('is_free') == False and 'price_overview' in app_data and app_data['price_overview'].get('final_formatted') == '':
-        return None, 'no_price', name
-      elif 'developers' in app_data and len(app_data['developers']) == 0:
-        return None, 'no_developer', name
-      else:
-        return app_data, 'ok', name
+      for appID, app in response.json().items():
+        # Free apps have an empty list as data.
+        if app.get('success') and isinstance(app.get('data'), dict) and 'price_overview' in app['data']:
+          prices[appID] = PriceOverview(app['data']['price_overview'])
     except Exception as ex:
       Log(EXCEPTION, f'An exception of type {ex} occurred. Traceback: {traceback.format_exc()}')
-      return None, 'exception', 'Unknown'
   else:
     Log(ERROR, 'Bad response')
-    return None, 'bad_response', 'Unknown'
 
-def SteamSpyRequest(appID, retryTime, successRequestCount, errorRequestCount, retries):
+  return prices
+
+class RegionalPrices:
+  '''
+  Games waiting for their prices in the rest of regions of 'currencies'. When PRICE_BATCH games are waiting, their
+  prices are requested at once in each region and then they are stored with 'store'. A game is never stored
+  without its prices, so if the scraper stops before, it is still pending.
+  '''
+  def __init__(self, args, store):
+    self.regions = [currency for currency in args.currencies if currency != args.currency]
+    self.retries = args.retries
+    self.store = store
+    self.waiting = []
+    self.added = 0
+
+  def Add(self, appID, game, reason, name):
+    batch = self.Wait(appID, game, reason, name)
+    if batch is not None:
+      self.Store(batch, self.Request(batch))
+
+  def Wait(self, appID, game, reason, name):
+    '''
+    Store the game if it does not need prices or keep it waiting. When PRICE_BATCH games are waiting, they are
+    returned to request their prices.
+    '''
+    if len(self.regions) == 0 or not game or game['release_date'] == '':
+      self.store(appID, game, reason, name)
+      return None
+
+    self.waiting.append((appID, game, reason, name))
+    if len(self.waiting) < PRICE_BATCH:
+      return None
+
+    batch, self.waiting = self.waiting, []
+    return batch
+
+  def Request(self, batch):
+    '''
+    Prices of the games of a batch in each region. It does not store them, so it can run in another thread.
+    '''
+    prices = {appID: {} for appID, game, reason, name in batch}
+    try:
+      with Span('prices'):
+        for currency in self.regions:
+          for appID, price in PricesRequest(list(prices), currency, self.retries).items():
+            prices[appID][currency] = price
+    except KeyboardInterrupt:
+      Log(WARNING, f'{len(batch)} games without their prices are not stored, they will be requested again')
+      return None
+
+    return prices
+
+  def Store(self, batch, prices):
+    if prices is None:
+      return
+
+    for appID, game, reason, name in batch:
+      game['prices'] = {**game.get('prices', {}), **prices[appID]}
+      self.store(appID, game, reason, name)
+    self.added += len(batch)
+
+  def Flush(self):
+    '''
+    Request the prices of the waiting games and store them.
+    '''
+    batch, self.waiting = self.waiting, []
+    if len(batch) > 0:
+      self.Store(batch, self.Request(batch))
+
+def SteamSpyRequest(appID, retries):
   '''
   Request and parse information about a Steam app using SteamSpy.
   '''
-  url = f"https://steamspy.com/api.php?request=appdetails&appid={appID}"
-  response = DoRequest(url, None, retryTime, successRequestCount, errorRequestCount, retries)
+  response = DoRequest(STEAMSPY_API_URL, {'request': 'appdetails', 'appid': appID}, retries, 'steamspy')
   if response:
     try:
-      data = response.json()
+      with metrics.Stage('parse'), Span('decode', True):
+        data = response.json()
       if data['developer'] != "":
         return data
       else:
@@ -194,11 +531,21 @@ def SteamSpyRequest(appID, retryTime, successRequestCount, errorRequestCount, re
 
 def ParseSteamGame(app):
   '''
-  Parse game info.
+  Parse game info. The time is added to the 'parse' stage of the process that runs it.
+  '''
+  with metrics.Stage('parse'), Span('parse', True):
+    return ParseGameInfo(app)
+
+def ParseGameInfo(app):
+  '''
+  Game info from the appdetails data of an app.
   '''
   game = {}
   game['name'] = app['name'].strip()
   game['release_date'] = app['release_date']['date'] if 'release_date' in app and not app['release_date']['coming_soon'] else ''
+  if game['release_date'] == '':
+    # Only to schedule the next check of a not released app, it is not stored with the games.
+    game['announced'] = app['release_date'].get('date', '').strip() if 'release_date' in app else ''
   game['required_age'] = int(str(app['required_age']).replace('+', '')) if 'required_age' in app else 0
 
   if app['is_free'] or 'price_overview' not in app:
@@ -291,183 +638,977 @@ def ParseSteamGame(app):
 
 def SaveJSON(data, filename, backup = False):
   try:
+    if IsShardsName(filename):
+      # The backup is made after writing the new shards.
+      with metrics.Stage('save'), Span('shards', True):
+        WriteShards(data.items(), filename, backup)
+      return
+
     if backup == True and os.path.exists(filename):
       name, ext = os.path.splitext(filename)
       os.replace(filename, name + '.bak')
 
-    with open(filename, 'w', encoding='utf-8') as fout:
+    if isinstance(data, CompactDataset):
+      # The games are decoded and written one at a time.
+      with metrics.Stage('save'), Span('json', True):
+        WriteJSONObject(data.items(), filename)
+      return
+
+    with metrics.Stage('save'), Span('json'), open(filename, 'w', encoding='utf-8') as fout:
       fout.seek(0)
-      fout.write(json.dumps(data, indent=4, ensure_ascii=False))
+      with Span('serialize', True):
+        text = json.dumps(data, indent=4, ensure_ascii=False)
+      fout.write(text)
       fout.truncate()
   except Exception as ex:
     Log(EXCEPTION, f'An exception of type {ex} occurred. Traceback: {traceback.format_exc()}')
     sys.exit()
 
-def LoadJSON(filename):
+def LoadJSON(filename, factory=dict):
   '''
-  Load a JSON file.
+  Load a JSON file or a folder of shards. Objects are read in chunks, without holding the whole text in memory, and
+  built with 'factory' from the (key, value) pairs.
   '''
   data = None
   try:
-    if os.path.exists(filename):
+    if os.path.exists(filename) and os.path.getsize(filename) > 0:
       Log(INFO, f"Loading '{filename}'")
-      with open(filename, 'r', encoding='utf-8') as fin:
-        text = fin.read()
-        if len(text) > 0:
-          data = json.loads(text)
+      try:
+        data = factory(IterGames(filename))
+      except ValueError:
+        with open(filename, 'r', encoding='utf-8') as fin:
+          data = json.load(fin)
   except Exception as ex:
     Log(EXCEPTION, f'An exception of type {ex} occurred. Traceback: {traceback.format_exc()}')
     sys.exit()
 
   return data
 
+class GameKeys(MutableMapping):
+  '''
+  Dataset that only loads the appIDs of a JSON file and keeps the new games in memory. The stored games are
+  streamed from the file when saving, without the removed ones.
+  '''
+  def __init__(self, filename):
+    self.filename = filename
+    if os.path.exists(filename):
+      Log(INFO, f"Loading appIDs from '{filename}'")
+    self.stored = set(IterGameKeys(filename)) if os.path.exists(filename) else set()
+    self.games = {}
+    self.loaded = {}
+    self.removed = set()
+
+  def __getitem__(self, appID):
+    if appID in self.games:
+      return self.games[appID]
+    if appID in self.loaded:
+      return self.loaded[appID]
+    if appID in self.stored:
+      # Slow with a JSON file, it is read until the game is found. The shards have an index.
+      game = FindGame(self.filename, appID)
+      if game is not None:
+        return game
+    raise KeyError(appID)
+
+  def __setitem__(self, appID, game):
+    self.games[appID] = game
+    self.loaded.pop(appID, None)
+
+  def __delitem__(self, appID):
+    if appID not in self:
+      raise KeyError(appID)
+
+    self.games.pop(appID, None)
+    self.loaded.pop(appID, None)
+    if appID in self.stored:
+      # The stored game is skipped when the file is written again.
+      self.stored.remove(appID)
+      self.removed.add(appID)
+
+  def __contains__(self, appID):
+    return appID in self.games or appID in self.stored
+
+  def __iter__(self):
+    yield from self.stored
+    yield from (appID for appID in self.games if appID not in self.stored)
+
+  def __len__(self):
+    return len(self.stored) + sum(1 for appID in self.games if appID not in self.stored)
+
+  def Load(self, appIDs):
+    '''
+    Read some stored games of a JSON file in one pass, instead of searching the file for each one.
+    '''
+    appIDs = {appID for appID in appIDs if appID in self.stored and appID not in self.games}
+    if len(appIDs) == 0 or IsShards(self.filename):
+      return
+
+    with Span('load', True):
+      for appID, game in IterGames(self.filename):
+        if appID in appIDs:
+          self.loaded[appID] = game
+    Log(INFO, f"{len(self.loaded)} games loaded from '{self.filename}'")
+
+  def items(self):
+    '''
+    Stream the stored games, replaced by the new ones, followed by the rest of new games.
+    '''
+    if len(self.stored) > 0 or len(self.removed) > 0:
+      for appID, game in IterGames(self.filename):
+        if appID in self.stored:
+          yield appID, self.games.get(appID, game)
+
+    for appID, game in self.games.items():
+      if appID not in self.stored:
+        yield appID, game
+
+  def Save(self, filename, backup=False):
+    '''
+    Write all the games to a JSON file or a folder of shards, same format as SaveJSON.
+    '''
+    if IsShardsName(filename):
+      # The old shards are read while the new ones are written apart.
+      with metrics.Stage('save'), Span('shards', True):
+        WriteShards(self.items(), filename, backup)
+    else:
+      if backup == True and os.path.exists(filename):
+        name, ext = os.path.splitext(filename)
+        os.replace(filename, name + '.bak')
+        if os.path.abspath(self.filename) == os.path.abspath(filename):
+          self.filename = name + '.bak'
+
+      with metrics.Stage('save'), Span('json', True):
+        WriteJSONObject(self.items(), filename)
+    self.filename = filename
+    self.stored.update(self.games)
+    self.games = {}
+    self.removed = set()
+
+class Journal:
+  '''
+  Append-only log of the new games, discarded and not released apps, one JSON line each. It is replayed on top of
+  the JSON files at startup and compacted into them at exit, so a crash loses at most one entry.
+  '''
+  def __init__(self, filename):
+    self.filename = filename
+    self.file = None
+    self.pending = 0
+
+  def Replay(self, dataset, notreleased, discarded):
+    '''
+    Apply the journal entries. A truncated last entry is removed. Returns the number of entries applied.
+    '''
+    count = 0
+    if os.path.exists(self.filename):
+      Log(INFO, f"Replaying '{self.filename}'")
+      offset = 0
+      with open(self.filename, 'rb') as fin:
+        for line in fin:
+          try:
+            entry = json.loads(line)
+          except ValueError:
+            Log(WARNING, f"Truncated entry in '{self.filename}' at byte {offset}, discarding it")
+            break
+
+          offset += len(line)
+          JournalApply(entry, dataset, notreleased, discarded)
+          count += 1
+
+      if offset < os.path.getsize(self.filename):
+        os.truncate(self.filename, offset)
+
+    self.pending += count
+
+    return count
+
+  def Append(self, kind, appID, value=None):
+    '''
+    Write an entry: 'game', 'notreleased' or 'discarded'.
+    '''
+    if self.file is None:
+      self.file = open(self.filename, 'a', encoding='utf-8')
+
+    with metrics.Stage('save'), Span('journal'):
+      self.file.write(json.dumps({'kind': kind, 'appid': appID, 'value': value}, ensure_ascii=False) + '\n')
+      self.file.flush()
+    self.pending += 1
+
+  def Compact(self, dataset, notreleased, discarded, outfile):
+    '''
+    Save the JSON files and empty the journal. Nothing is written if there are no new entries.
+    '''
+    if self.pending == 0:
+      return
+
+    if isinstance(dataset, GameKeys):
+      dataset.Save(outfile, True)
+    else:
+      SaveJSON(dataset, outfile, True)
+    SaveJSON(discarded, DISCARDED_FILE, True)
+    SaveJSON(notreleased, NOTRELEASED_FILE, True)
+
+    if self.file is not None:
+      self.file.close()
+      self.file = None
+
+    if os.path.exists(self.filename):
+      os.remove(self.filename)
+
+    self.pending = 0
+
+def JournalApply(entry, dataset, notreleased, discarded):
+  '''
+  Apply one journal entry.
+  '''
+  appID = entry['appid']
+  if entry['kind'] == 'game':
+    dataset[appID] = entry['value']
+    if appID in notreleased:
+      del notreleased[appID]
+    if appID in discarded:
+      del discarded[appID]
+  elif entry['kind'] == 'notreleased':
+    # Old journals have no value.
+    notreleased[appID] = entry['value'] if entry['value'] is not None else {}
+  elif entry['kind'] == 'discarded':
+    discarded[appID] = entry['value']
+
+# Journal of changes, if enabled
+journal = None
+
+class Checkpoint:
+  '''
+  Order of the apps of a full crawl and how far it got, so an interrupted crawl continues in the same place. The
+  order is shuffled with a seed and written once. The position, the apps done out of order and the apps being
+  requested are written at every request. An app whose result was stored only counts as done when it is saved
+  (autosave, journal or SaveData), so the position never moves past unsaved data. Both files are replaced
+  atomically. An app that was being requested
+  MAX_ATTEMPTS times without finishing, because it stopped the scraper, is skipped. Apps being requested when the
+  user stops the crawl, or Steam does not answer, do not count.
+  '''
+  def __init__(self, basename):
+    self.queueFile = basename + QUEUE_EXT
+    self.cursorFile = basename + CURSOR_EXT
+    self.seed = 0
+    self.apps = []
+    self.cursor = 0
+    self.finished = set()
+    self.attempts = {}
+    self.requesting = set()
+    self.position = {}
+    # Apps stored and not saved yet, {appID: kind}, and those already done, {appID: index}.
+    self.unsaved = {}
+    self.waiting = {}
+
+  def Write(self, data, filename):
+    try:
+      with open(filename + '.tmp', 'w', encoding='utf-8') as fout:
+        json.dump(data, fout)
+      os.replace(filename + '.tmp', filename)
+    except Exception as ex:
+      Log(EXCEPTION, f'An exception of type {ex} occurred. Traceback: {traceback.format_exc()}')
+
+  def Load(self):
+    queue = LoadJSON(self.queueFile)
+    if not queue:
+      return False
+
+    self.seed = queue['seed']
+    self.apps = queue['apps']
+    state = LoadJSON(self.cursorFile) or {}
+    self.cursor = state.get('cursor', 0)
+    self.finished = set(state.get('finished', []))
+    self.attempts = state.get('attempts', {})
+
+    return True
+
+  def Prepare(self, apps, isPending):
+    '''
+    Continue the crawl, adding the new pending apps at the end, or start a new one with the pending apps.
+    '''
+    if self.Load():
+      known = set(self.apps)
+      new = [appID for appID in apps if appID not in known and isPending(appID)]
+      random.Random(self.seed + len(self.apps)).shuffle(new)
+      if len(new) > 0:
+        self.apps.extend(new)
+        self.Write({'seed': self.seed, 'apps': self.apps}, self.queueFile)
+
+      Log(INFO, f'Crawl resumed at {self.cursor} of {len(self.apps)} apps, {len(self.apps) - self.cursor - len(self.finished)} pending' +
+                (f' ({len(new)} new)' if len(new) > 0 else ''))
+    else:
+      self.seed = random.randrange(1 << 32)
+      self.apps = [appID for appID in apps if isPending(appID)]
+      random.Random(self.seed).shuffle(self.apps)
+      self.Write({'seed': self.seed, 'apps': self.apps}, self.queueFile)
+      self.Save()
+
+      Log(INFO, f'New crawl of {len(self.apps)} apps')
+
+  def Remaining(self):
+    '''
+    AppIDs still to request, in order.
+    '''
+    self.position = {self.apps[index]: index for index in range(self.cursor, len(self.apps)) if index not in self.finished}
+    for appID in [appID for appID in self.position if self.attempts.get(appID, 0) >= MAX_ATTEMPTS]:
+      Log(WARNING, f'App {appID} skipped, it did not finish in {MAX_ATTEMPTS} attempts')
+      self.Done(appID, True)
+
+    return list(self.position)
+
+  @contextlib.contextmanager
+  def Attempt(self, appID):
+    '''
+    Request of an app. It counts as an attempt until it is done, unless the user, Steam or another request stop it.
+    '''
+    if appID in self.position and appID not in self.requesting:
+      self.attempts[appID] = self.attempts.get(appID, 0) + 1
+      self.requesting.add(appID)
+      self.Save()
+
+    try:
+      yield
+    except Exception:
+      # The app failed, the attempt is kept.
+      self.requesting.discard(appID)
+      raise
+    except BaseException:
+      if appID in self.requesting:
+        self.requesting.discard(appID)
+        self.attempts[appID] -= 1
+        if self.attempts[appID] == 0:
+          del self.attempts[appID]
+        self.Save()
+      raise
+
+  def Done(self, appID, skipped=False):
+    index = self.position.pop(appID, None)
+    if index is None:
+      return
+
+    self.requesting.discard(appID)
+    if not skipped:
+      self.attempts.pop(appID, None)
+
+    if appID in self.unsaved:
+      self.waiting[appID] = index
+    else:
+      self.Finished(index)
+
+  def Stored(self, appID, kind):
+    '''
+    The result of an app ('game', 'notreleased' or 'discarded') is stored, but not saved yet.
+    '''
+    if appID in self.position:
+      self.unsaved[appID] = kind
+
+  def Saved(self, kind=None):
+    '''
+    The stored results of a kind, or of all of them, are saved.
+    '''
+    for appID in [appID for appID, stored in self.unsaved.items() if kind is None or stored == kind]:
+      del self.unsaved[appID]
+      if appID in self.waiting:
+        self.Finished(self.waiting.pop(appID))
+
+  def Finished(self, index):
+    self.finished.add(index)
+    while self.cursor in self.finished:
+      self.finished.remove(self.cursor)
+      self.attempts.pop(self.apps[self.cursor], None)
+      self.cursor += 1
+
+  def Save(self):
+    self.Write({'cursor': self.cursor, 'finished': sorted(self.finished), 'attempts': self.attempts}, self.cursorFile)
+
+  def Finish(self):
+    '''
+    Save the position, or remove the files if all the apps are done.
+    '''
+    if self.cursor < len(self.apps):
+      self.Save()
+      return
+
+    for filename in (self.queueFile, self.cursorFile):
+      if os.path.exists(filename):
+        os.remove(filename)
+    Log(INFO, f'Crawl of {len(self.apps)} apps finished')
+
+# SQLite database, if enabled
+database = None
+
+# Checkpoint of the running crawl, if any
+crawl = None
+
+def Autosave(kind, appID, value, data, filename, count, args):
+  '''
+  Record a new entry: appended to the journal, or every 'autosave' entries committed to the database or saved
+  to its JSON file. The checkpoint of the crawl only counts the entries already saved.
+  '''
+  if crawl is not None:
+    crawl.Stored(appID, kind)
+
+  if journal is not None:
+    journal.Append(kind, appID, value)
+    if crawl is not None:
+      crawl.Saved(kind)
+  elif args.autosave > 0 and count % args.autosave == 0:
+    if database is not None:
+      with metrics.Stage('save'):
+        database.Commit()
+      if crawl is not None:
+        crawl.Saved()
+    else:
+      SaveJSON(data, filename, True)
+      if crawl is not None:
+        crawl.Saved(kind)
+
+def SaveData(dataset, notreleased, discarded, args, backup=False):
+  '''
+  Save the dataset, the discarded apps and the not released list, compacting the journal if enabled.
+  '''
+  with Span('save'):
+    if database is not None:
+      with metrics.Stage('save'):
+        database.Commit()
+    elif journal is not None:
+      journal.Compact(dataset, notreleased, discarded, args.outfile)
+    else:
+      SaveJSON(dataset, args.outfile, backup)
+      SaveJSON(discarded, DISCARDED_FILE, backup)
+      SaveJSON(notreleased, NOTRELEASED_FILE, backup)
+
+    if crawl is not None:
+      crawl.Saved()
+
+def AddSteamSpyInfo(game, extra):
+  '''
+  Add the SteamSpy info to a game, or empty values for the fields it does not have yet. The info of the paged
+  'all' request has no tags, so the previous ones are kept.
+  '''
+  if extra != None:
+    game['user_score'] = extra['userscore']
+    game['score_rank'] = extra['score_rank']
+    game['positive'] = extra['positive']
+    game['negative'] = extra['negative']
+    game['estimated_owners'] = extra['owners'].replace(',', '').replace('..', '-')
+    game['average_playtime_forever'] = extra['average_forever']
+    game['average_playtime_2weeks'] = extra['average_2weeks']
+    game['median_playtime_forever'] = extra['median_forever']
+    game['median_playtime_2weeks'] = extra['median_2weeks']
+    game['discount'] = extra['discount']
+    game['peak_ccu'] = extra['ccu']
+    if 'tags' in extra:
+      game['tags'] = extra['tags']
+  else:
+    game.setdefault('user_score', 0)
+    game.setdefault('score_rank', "")
+    game.setdefault('positive', 0)
+    game.setdefault('negative', 0)
+    game.setdefault('estimated_owners', "0 - 0")
+    game.setdefault('average_playtime_forever', 0)
+    game.setdefault('average_playtime_2weeks', 0)
+    game.setdefault('median_playtime_forever', 0)
+    game.setdefault('median_playtime_2weeks', 0)
+    game.setdefault('discount', 0)
+    game.setdefault('peak_ccu', 0)
+    game.setdefault('tags', [])
+
+class SteamSpyCache:
+  '''
+  SteamSpy info of all the apps, downloaded in the background with the paged 'all' request (about 1000 apps per
+  page, one page per minute). An incomplete download continues in the next run.
+  '''
+  def __init__(self, filename):
+    self.filename = filename
+    self.lock = threading.Lock()
+    self.thread = None
+    self.changed = False
+    data = LoadJSON(filename) or {}
+    self.updated = data.get('updated', 0)
+    self.page = data.get('page', 0)
+    self.apps = data.get('apps', {})
+    rates.Bucket('steamspy_all', STEAMSPY_ALL_RATE)
+
+  def Get(self, appID):
+    return self.apps.get(appID)
+
+  def Start(self, retries):
+    '''
+    Start the download if the info is older than a day, or was not completed.
+    '''
+    if self.page > 0 or time.time() - self.updated > STEAMSPY_CACHE_TTL:
+      Log(INFO, f"Downloading SteamSpy info in the background from page {self.page}")
+      self.thread = threading.Thread(target=self.Download, args=(retries,), daemon=True)
+      self.thread.start()
+
+  def Download(self, retries):
+    while True:
+      response = DoRequest(STEAMSPY_API_URL, {'request': 'all', 'page': self.page}, retries, 'steamspy_all')
+      if response is None:
+        Log(ERROR, f'Bad SteamSpy page {self.page}')
+        return
+
+      try:
+        data = response.json()
+      except ValueError:
+        Log(ERROR, f'Bad SteamSpy page {self.page}')
+        return
+
+      with self.lock:
+        if isinstance(data, dict) and len(data) > 0:
+          self.apps.update({str(appID): info for appID, info in data.items()})
+          self.page += 1
+        else:
+          self.updated = int(time.time())
+          self.page = 0
+        self.changed = True
+
+      if self.page == 0:
+        Log(INFO, f'SteamSpy info of {len(self.apps)} apps downloaded')
+        return
+
+  def Save(self):
+    with self.lock:
+      if self.changed:
+        SaveJSON({'updated': self.updated, 'page': self.page, 'apps': self.apps}, self.filename)
+        self.changed = False
+
+# SteamSpy info of all the apps, if enabled
+steamspy = None
+
+def FetchGame(appID, args, known=False):
+  '''
+  Request an app from Steam and, if it is a released game, its SteamSpy info. Returns the parsed game (or None),
+  the reason and the name.
+  '''
+  with Span('fetch'):
+    app, reason, name = SteamRequest(appID, args.retries, args.currency, args.language)
+    if app is None:
+      return None, reason, name
+
+    return FinishGame(appID, app, ParseSteamGame(app), args, known), reason, name
+
+def FinishGame(appID, app, game, args, known=False):
+  '''
+  Add to a parsed game the request time, the prices and the SteamSpy info. The SteamSpy info is read from the
+  cache first, and only requested if it is not there, or if it is a new game ('known' is False) that needs the tags.
+  '''
+  game['fetched'] = int(time.time())
+  if len(args.currencies) > 0:
+    game['prices'] = {args.currency: PriceOverview(app['price_overview'])} if 'price_overview' in app else {}
+  if game['release_date'] != '' and args.steamspy:
+    extra = steamspy.Get(appID) if steamspy is not None else None
+    if extra is None or not known:
+      extra = SteamSpyRequest(appID, args.retries) or extra
+
+    # Without SteamSpy info, a game already in the dataset keeps the previous one.
+    if extra is not None:
+      AddSteamSpyInfo(game, extra)
+
+  return game
+
+def IsPending(appID, dataset, notreleased, discarded, args, changed=()):
+  '''
+  True if the app must be requested.
+  '''
+  with Span('pending', True):
+    if args.refresh > 0 or appID in changed:
+      return True
+
+    if appID in dataset or appID in discarded:
+      return False
+
+    return not (args.released and appID in notreleased and NextCheck(notreleased[appID]) > time.time())
+
+def ReleaseTime(info):
+  '''
+  Time of the announced release date of a not released app, or None if it could not be parsed.
+  '''
+  return time.mktime(dt.date.fromisoformat(info['release']).timetuple()) if info.get('release') else None
+
+def NextCheck(info):
+  '''
+  Time to request again a not released app: when its announced date has passed, or after a backoff that doubles with
+  each check that finds it not released, up to NOTRELEASED_MAX_BACKOFF days. Apps never checked, from old lists,
+  are due.
+  '''
+  if 'checked' not in info:
+    return 0
+
+  due = info['checked'] + min(NOTRELEASED_BACKOFF * 2 ** max(0, info['checks'] - 1), NOTRELEASED_MAX_BACKOFF) * 86400
+  release = ReleaseTime(info)
+  if release is not None and release > info['checked']:
+    due = min(due, release)
+
+  return due
+
+def NotReleasedInfo(date, previous, now):
+  '''
+  Record of a not released app: the announced date ('date'), parsed if possible ('release', ISO date or None), the
+  time of the last check ('checked') and the number of checks that found it not released ('checks'). The backoff
+  starts again when the announced date changes or has just passed.
+  '''
+  release = ParseReleaseDate(date) if date != '' else None
+  info = {'date': date, 'release': release.isoformat() if release is not None else None, 'checked': int(now), 'checks': 1}
+  if previous and previous.get('date') == date:
+    released = ReleaseTime(info)
+    if released is None or not previous.get('checked', 0) < released <= now:
+      info['checks'] = previous.get('checks', 0) + 1
+
+  return info
+
+def StoreGame(appID, game, reason, name, dataset, notreleased, discarded, args, stats):
+  '''
+  Add the result of a request to the dataset, the not released list or the discarded apps.
+  '''
+  if appID in dataset:
+    # Refresh: the new fields are merged into the existing record. If the request failed, the record is kept.
+    if game and game['release_date'] != '':
+      game = {**dataset[appID], **game}
+      dataset[appID] = game
+      stats['refreshed'] += 1
+      metrics.Count('apps_total', result='refreshed')
+
+      Autosave('game', appID, game, dataset, args.outfile, stats['refreshed'], args)
+  elif game:
+    if game['release_date'] != '':
+      if args.steamspy:
+        AddSteamSpyInfo(game, None)
+
+      dataset[appID] = game
+      stats['added'] += 1
+      metrics.Count('apps_total', result='added')
+
+      if appID in notreleased:
+        del notreleased[appID]
+
+      if appID in discarded:
+        del discarded[appID]
+
+      Autosave('game', appID, game, dataset, args.outfile, stats['added'], args)
+    else:
+      previous = notreleased.get(appID)
+      notreleased[appID] = NotReleasedInfo(game.get('announced', ''), previous, game.get('fetched', time.time()))
+      if previous is None:
+        stats['notreleased'] += 1
+        metrics.Count('apps_total', result='notreleased')
+      else:
+        stats['rechecked'] += 1
+        metrics.Count('apps_total', result='rechecked')
+
+      Autosave('notreleased', appID, notreleased[appID], notreleased, NOTRELEASED_FILE, stats['notreleased'] + stats['rechecked'], args)
+  else:
+    discarded[appID] = {'name': name, 'reason': reason}
+    stats['discarded'] += 1
+    metrics.Count('apps_total', result='discarded')
+
+    Autosave('discarded', appID, discarded[appID], discarded, DISCARDED_FILE, stats['discarded'], args)
+
+def ParserPool(parsers):
+  '''
+  Pool of processes to parse the responses, or None. The processes are spawned, not forked from a process with
+  threads running.
+  '''
+  return ProcessPoolExecutor(max_workers=parsers, mp_context=multiprocessing.get_context('spawn')) if parsers > 0 else None
+
+async def ScrapeConcurrent(apps, dataset, args, prices, checkpoint=None, done=0):
+  '''
+  Keeps several requests in flight. Each host has its own token bucket, so Steam and SteamSpy don't wait on each
+  other. With 'parsers', the responses go through a bounded queue to a pool of processes that parse them, so
+  parsing does not hold the requests. The results are added to 'prices' from the event loop, one at a time, and
+  the prices of each full batch are requested in the executor. 'done' is the number of apps of the crawl done before.
+  '''
+  loop = asyncio.get_running_loop()
+  workers = max(1, args.workers)
+  executor = ThreadPoolExecutor(max_workers=workers)
+  pool = ParserPool(args.parsers)
+  parseQueue = asyncio.Queue(maxsize=workers * 2)
+  queue = iter(apps)
+  total = done + len(apps)
+  count = done
+
+  async def Store(appID, game, reason, name):
+    nonlocal count
+    count += 1
+    ProgressBar('Scraping', count, total, rates.Status())
+    batch = prices.Wait(appID, game, reason, name)
+    if batch is not None:
+      prices.Store(batch, await loop.run_in_executor(executor, prices.Request, batch))
+
+  async def Worker():
+    for appID in queue:
+      with checkpoint.Attempt(appID) if checkpoint is not None else contextlib.nullcontext():
+        if pool is None:
+          await Store(appID, *await loop.run_in_executor(executor, FetchGame, appID, args, appID in dataset))
+        else:
+          await parseQueue.put((appID, *await loop.run_in_executor(executor, SteamRequest, appID, args.retries, args.currency, args.language)))
+
+  async def Parser():
+    while True:
+      item = await parseQueue.get()
+      if item is None:
+        return
+
+      appID, app, reason, name = item
+      with checkpoint.Attempt(appID) if checkpoint is not None else contextlib.nullcontext():
+        game = None
+        if app is not None:
+          # Measured here, the metrics of the parser processes are not shared.
+          with metrics.Stage('parse'):
+            game = await loop.run_in_executor(pool, ParseSteamGame, app)
+          game = await loop.run_in_executor(executor, FinishGame, appID, app, game, args, appID in dataset)
+        await Store(appID, game, reason, name)
+
+  async def Fetch():
+    await asyncio.gather(*[Worker() for _ in range(workers)])
+    for _ in range(workers):
+      await parseQueue.put(None)
+
+  if pool is None:
+    tasks = [asyncio.create_task(Worker()) for _ in range(workers)]
+  else:
+    tasks = [asyncio.create_task(Fetch())] + [asyncio.create_task(Parser()) for _ in range(workers)]
+
+  try:
+    await asyncio.gather(*tasks)
+  finally:
+    # If one fails, the rest are stopped before the executors.
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    executor.shutdown(wait=False, cancel_futures=True)
+    if pool is not None:
+      pool.shutdown(wait=False, cancel_futures=True)
+
 def Scraper(dataset, notreleased, discarded, args, steam_api_key, appIDs = None):
   '''
   Search games in Steam.
   '''
+  global crawl
+  rates.Configure(1.0 / args.sleep if args.sleep > 0 else args.max_rate, args.max_rate)
+
   apps = []
+  changed = set()
+  checkpoint = None
   if appIDs is None:
-    # Load existing applist if it exists
-    if os.path.exists(APPLIST_FILE):
-      with open(APPLIST_FILE, 'r', encoding='utf-8') as fin:
-        text = fin.read()
-        if len(text) > 0:
-          apps = json.loads(text)
-          Log(INFO, f'List with {len(apps)} games loaded from {APPLIST_FILE}')
+    applist = LoadAppList()
+    if len(applist['apps']) > 0:
+      Log(INFO, f"List with {len(applist['apps'])} apps loaded from {APPLIST_FILE}")
 
     # Update from Steam if not explicitly disabled
     if args.only_applist == False:
-      Log(INFO, 'Updating list of games from Steam')
-      steam_apps = []
-      last_appid = 0
-      while True:
-        parameters = {
-          'key': steam_api_key,
-          'max_results': 50000,
-          'last_appid': last_appid
-        }
-        response = DoRequest('https://api.steampowered.com/IStoreService/GetAppList/v1/', parameters)
-        if response:
-          data = response.json()
-          if 'response' in data and 'apps' in data['response']:
-            batch = [str(x["appid"]) for x in data['response']['apps']]
-            steam_apps.extend(batch)
-            if data['response'].get('have_more_results'):
-              last_appid = data['response'].get('last_appid')
-              Log(INFO, f'Retrieved {len(steam_apps)} apps from Steam...')
-              time.sleep(args.sleep)
-            else:
-              break
-          else:
-            Log(ERROR, 'Unexpected response format from Steam API')
-            break
-        else:
-          break
-
-      if steam_apps:
-        # Merge and remove duplicates
-        apps = list(set(apps + steam_apps))
-        Log(INFO, f'List updated: {len(apps)} total games')
-        with open(APPLIST_FILE, 'w', encoding='utf-8') as fout:
-          fout.seek(0)
-          fout.write(json.dumps(apps, indent=4, ensure_ascii=False))
-          fout.truncate()
-    elif not apps:
+      with Span('applist'):
+        UpdateAppList(applist, args, steam_api_key)
+    elif len(applist['apps']) == 0:
       Log(ERROR, f'{APPLIST_FILE} not found and --only-applist is enabled')
       sys.exit()
-  else:
-    apps = appIDs
-
-  if apps:
-    gamesAdded = 0
-    gamesNotReleased = 0
-    gamesDiscarded = 0
-    successRequestCount = 0
-    errorRequestCount = 0
 
+    # The apps known to be DLC, software, videos or hardware are never requested.
+    games = AppListGames(applist)
+    if len(games) < len(applist['apps']):
+      Log(INFO, f"{len(applist['apps']) - len(games)} apps that are not games skipped")
+
+    changed = {appID for appID in applist['changed'] if appID in games and InShard(appID, args.shard)}
+    if len(changed) > 0:
+      Log(INFO, f'{len(changed)} apps changed since they were requested')
+      if isinstance(dataset, GameKeys):
+        # The changed games are merged with the stored ones.
+        dataset.Load(changed)
+
+    # A full crawl follows the order of the checkpoint. Changed apps go first.
+    checkpoint = Checkpoint(os.path.splitext(args.outfile)[0])
+    with Span('checkpoint'):
+      checkpoint.Prepare([appID for appID in games if InShard(appID, args.shard)],
+                         lambda appID: IsPending(appID, dataset, notreleased, discarded, args))
+    apps = list(changed)
     random.shuffle(apps)
-    total = len(apps)
-    count = 0
+    apps += [appID for appID in checkpoint.Remaining() if appID not in changed]
+  else:
+    apps = [appID for appID in appIDs if InShard(appID, args.shard)]
+    # When refreshing, the apps are sorted by priority.
+    if args.refresh <= 0:
+      random.shuffle(apps)
+  crawl = checkpoint
 
+  if apps:
+    stats = {'added': 0, 'notreleased': 0, 'discarded': 0, 'refreshed': 0, 'rechecked': 0}
+    done = checkpoint.cursor + len(checkpoint.finished) if checkpoint is not None else 0
+    total = done + len(apps)
+    count = done
+
+    def Store(appID, game, reason, name):
+      with Span('store', True):
+        StoreGame(appID, game, reason, name, dataset, notreleased, discarded, args, stats)
+      changed.discard(appID)
+      if checkpoint is not None:
+        checkpoint.Done(appID)
+
+    prices = RegionalPrices(args, Store)
     try:
-      for appID in apps:
-        if appID not in dataset and appID not in discarded:
-          if args.released and appID in notreleased:
-            continue
-
-          app, reason, name = SteamRequest(appID, min(4, args.sleep), successRequestCount, errorRequestCount, args.retries)
-          if app:
-            game = ParseSteamGame(app)
-            if game['release_date'] != '':
-              if args.steamspy:
-                extra = SteamSpyRequest(appID, min(4, args.sleep), successRequestCount, errorRequestCount, args.retries)
-                if extra != None:
-                  game['user_score'] = extra['userscore']
-                  game['score_rank'] = extra['score_rank']
-                  game['positive'] = extra['positive']
-                  game['negative'] = extra['negative']
-                  game['estimated_owners'] = extra['owners'].replace(',', '').replace('..', '-')
-                  game['average_playtime_forever'] = extra['average_forever']
-                  game['average_playtime_2weeks'] = extra['average_2weeks']
-                  game['median_playtime_forever'] = extra['median_forever']
-                  game['median_playtime_2weeks'] = extra['median_2weeks']
-                  game['discount'] = extra['discount']
-                  game['peak_ccu'] = extra['ccu']
-                  game['tags'] = extra['tags']
-                else:
-                  game['user_score'] = 0
-                  game['score_rank'] = ""
-                  game['positive'] = 0
-                  game['negative'] = 0
-                  game['estimated_owners'] = "0 - 0"
-                  game['average_playtime_forever'] = 0
-                  game['average_playtime_2weeks'] = 0
-                  game['median_playtime_forever'] = 0
-                  game['median_playtime_2weeks'] = 0
-                  game['discount'] = 0
-                  game['peak_ccu'] = 0
-                  game['tags'] = []
-
-              dataset[appID] = game
-              gamesAdded += 1
-
-              if appID in notreleased:
-                notreleased.remove(appID)
-
-              if args.autosave > 0 and gamesAdded > 0 and gamesAdded % args.autosave == 0:
-                SaveJSON(dataset, args.outfile, True)
-            else:
-              if appID not in notreleased:
-                notreleased.append(appID)
-                gamesNotReleased += 1
-
-                if args.autosave > 0 and gamesNotReleased > 0 and gamesNotReleased % args.autosave == 0:
-                  SaveJSON(notreleased, NOTRELEASED_FILE, True)
-
-              text = f"'{game['name']}' is not released yet"
-          else:
-            discarded[appID] = {'name': name, 'reason': reason}
-            gamesDiscarded += 1
-
-          if args.autosave > 0 and gamesDiscarded > 0 and gamesDiscarded % args.autosave == 0:
-            SaveJSON(discarded, DISCARDED_FILE, True)
-
-          time.sleep(args.sleep if random.random() > 0.1 else args.sleep * 2.0)
-        count += 1
-        ProgressBar('Scraping', count, total)
+      if args.workers > 1 or args.parsers > 0:
+        pending = []
+        for appID in dict.fromkeys(apps):
+          if IsPending(appID, dataset, notreleased, discarded, args, changed):
+            pending.append(appID)
+          elif checkpoint is not None:
+            checkpoint.Done(appID)
+        Log(INFO, f'{len(pending)} apps pending, using {max(1, args.workers)} workers' +
+                  (f' and {args.parsers} parsers' if args.parsers > 0 else ''))
+        if args.workers > requests.adapters.DEFAULT_POOLSIZE:
+          session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=args.workers))
+          session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.workers))
+
+        total = len(pending)
+        if total > 0:
+          asyncio.run(ScrapeConcurrent(pending, dataset, args, prices, checkpoint, done))
+      else:
+        for appID in apps:
+          if IsPending(appID, dataset, notreleased, discarded, args, changed):
+            with checkpoint.Attempt(appID) if checkpoint is not None else contextlib.nullcontext():
+              game, reason, name = FetchGame(appID, args, appID in dataset)
+            prices.Add(appID, game, reason, name)
+          elif checkpoint is not None:
+            checkpoint.Done(appID)
+          count += 1
+          ProgressBar('Scraping', count, total, rates.Status())
     except KeyboardInterrupt:
       pass
+    except BaseException:
+      if checkpoint is not None:
+        checkpoint.Save()
+      raise
 
-    ProgressBar('Scraping', total, total)
+    prices.Flush()
+    ProgressBar('Scraping', total, max(total, 1))
     print('\r')
-    SaveJSON(dataset, args.outfile)
-    SaveJSON(discarded, DISCARDED_FILE)
-    SaveJSON(notreleased, NOTRELEASED_FILE)
-
-    return gamesAdded, gamesNotReleased, gamesDiscarded
+    if prices.added > 0:
+      Log(INFO, f'Prices of {prices.added} games added in {len(prices.regions)} more regions')
+    SaveData(dataset, notreleased, discarded, args)
+    if steamspy is not None:
+      steamspy.Save()
+    if appIDs is None:
+      applist['changed'] = sorted(changed, key=int)
+      SaveAppList(applist)
+      checkpoint.Finish()
+
+    if stats['refreshed'] > 0:
+      Log(INFO, f"{stats['refreshed']} games refreshed")
+    if stats['rechecked'] > 0:
+      Log(INFO, f"{stats['rechecked']} apps still not released")
+
+    return stats['added'], stats['notreleased'], stats['discarded']
+
+  if checkpoint is not None:
+    checkpoint.Finish()
 
   return 0, 0, 0
 
+def LoadAppList():
+  '''
+  Load the list of apps: {'last_update': {type: time}, 'apps': {appID: {'type', 'last_modified',
+  'price_change_number'}}, 'changed': [appIDs to request again]}. The old formats, a list of appIDs or a single update
+  time, are migrated. The old update time is dropped, so the next update gets the type of every app.
+  '''
+  applist = LoadJSON(APPLIST_FILE)
+  if isinstance(applist, list):
+    applist = {'apps': {appID: {} for appID in applist}}
+  elif applist is None:
+    applist = {}
+
+  if not isinstance(applist.get('last_update', {}), dict):
+    applist['last_update'] = {}
+
+  applist.setdefault('last_update', {})
+  applist.setdefault('apps', {})
+  applist.setdefault('changed', [])
+
+  return applist
+
+def AppListGames(applist):
+  '''
+  AppIDs of the list that are games. Apps of unknown type, from old lists, are included until a full list of games
+  is received.
+  '''
+  return dict.fromkeys(appID for appID, info in applist['apps'].items() if info.get('type', 'game') == 'game')
+
+def SaveAppList(applist):
+  try:
+    with open(APPLIST_FILE, 'w', encoding='utf-8') as fout:
+      json.dump(applist, fout, ensure_ascii=False)
+  except Exception as ex:
+    Log(EXCEPTION, f'An exception of type {ex} occurred. Traceback: {traceback.format_exc()}')
+
+def UpdateAppList(applist, args, steam_api_key):
+  '''
+  Add the apps modified in Steam since the last update. Each type of app in 'args.app_types' is requested on its own,
+  so the type of every app is known, and has its own update time. The known games whose modification time or price
+  changed are added to the list of changed apps, to be requested again.
+  '''
+  apps = applist['apps']
+  changed = set(applist['changed'])
+  received = 0
+  added = 0
+  for appType in args.app_types:
+    since = applist['last_update'].get(appType, 0)
+    Log(INFO, f'Updating list of {appType} apps from Steam' if since == 0 else
+              f"Updating list of {appType} apps modified since {dt.datetime.fromtimestamp(since).strftime('%Y-%m-%d %H:%M')}")
+    started = int(time.time())
+    complete = False
+    last_appid = 0
+    while True:
+      parameters = {
+        'key': steam_api_key,
+        'max_results': 50000,
+        'last_appid': last_appid
+      }
+      for name, include in APP_TYPES.items():
+        parameters[include] = 'true' if name == appType else 'false'
+      if since > 0:
+        parameters['if_modified_since'] = since
+
+      response = DoRequest(STEAM_APPLIST_URL, parameters, args.retries, 'applist')
+      if response:
+        data = response.json()
+        if 'response' in data:
+          for app in data['response'].get('apps', []):
+            appID = str(app['appid'])
+            info = {'type': appType, 'last_modified': app.get('last_modified', 0), 'price_change_number': app.get('price_change_number', 0)}
+            if appID not in apps:
+              added += 1
+            elif (appType == 'game' and 'last_modified' in apps[appID] and
+                  (apps[appID]['last_modified'], apps[appID]['price_change_number']) != (info['last_modified'], info['price_change_number'])):
+              changed.add(appID)
+            apps[appID] = info
+            received += 1
+
+          if data['response'].get('have_more_results'):
+            last_appid = data['response'].get('last_appid')
+            Log(INFO, f'Retrieved {received} apps from Steam...')
+          else:
+            complete = True
+            break
+        else:
+          Log(ERROR, 'Unexpected response format from Steam API')
+          break
+      else:
+        break
+
+    # If the list was not completed, the next update starts again from the same time.
+    if complete:
+      applist['last_update'][appType] = started
+      if appType == 'game' and since == 0:
+        # The apps of old lists without type that are not in the full list of games are not games.
+        untyped = [info for info in apps.values() if 'type' not in info]
+        for info in untyped:
+          info['type'] = 'other'
+        if len(untyped) > 0:
+          Log(INFO, f'{len(untyped)} apps of the old list are not games')
+  applist['changed'] = sorted(changed, key=int)
+
+  Log(INFO, f'List updated: {len(apps)} total apps ({len(AppListGames(applist))} games), {added} new, {len(changed)} changed')
+  SaveAppList(applist)
+
 def UpdateFromCSV(dataset, notreleased, discarded, args, steam_api_key):
   '''
   Update using APPIDs from a CSV file. The first column must contain the APPID.
@@ -502,6 +1643,167 @@ def UpdateFromCSV(dataset, notreleased, discarded, args, steam_api_key):
 
   return 0, 0, 0
 
+def ParseResponse(appID, text):
+  '''
+  Parse an appdetails response. Returns the game (or None), the reason and the name.
+  '''
+  app, reason, name = ParseAppDetails(appID, json.loads(text))
+
+  return (ParseSteamGame(app) if app is not None else None), reason, name
+
+def Rebuild(dataset, notreleased, discarded, args):
+  '''
+  Parse again all the Steam responses in the cache, without requests, in batches of PARSE_BATCH responses shared
+  by the 'parsers' processes. The SteamSpy info of the games already in the dataset is kept.
+  '''
+  stats = {'added': 0, 'notreleased': 0, 'discarded': 0, 'refreshed': 0, 'rechecked': 0}
+  Log(INFO, f"Rebuilding from '{cache.filename}'" + (f' with {args.parsers} parsers' if args.parsers > 0 else ''))
+  pool = ParserPool(args.parsers)
+  items = cache.Items(f'appdetails/%/{args.currency}/{args.language}')
+  try:
+    while True:
+      batch = [(key.split('/')[1], text, fetched) for key, text, fetched in itertools.islice(items, PARSE_BATCH)]
+      if len(batch) == 0:
+        break
+
+      if pool is not None:
+        results = [pool.submit(ParseResponse, appID, text) for appID, text, fetched in batch]
+
+      for index, (appID, text, fetched) in enumerate(batch):
+        try:
+          game, reason, name = results[index].result() if pool is not None else ParseResponse(appID, text)
+        except Exception as ex:
+          Log(EXCEPTION, f'An exception of type {ex} occurred parsing {appID}. Traceback: {traceback.format_exc()}')
+          continue
+
+        if game is not None:
+          game['fetched'] = int(fetched)
+          if steamspy is not None and steamspy.Get(appID) is not None:
+            AddSteamSpyInfo(game, steamspy.Get(appID))
+
+        StoreGame(appID, game, reason, name, dataset, notreleased, discarded, args, stats)
+  except KeyboardInterrupt:
+    pass
+  finally:
+    if pool is not None:
+      pool.shutdown(cancel_futures=True)
+
+  Log(INFO, f"{stats['added']} games added and {stats['refreshed']} updated from the cache")
+  SaveData(dataset, notreleased, discarded, args)
+
+  return stats['added'], stats['notreleased'], stats['discarded']
+
+def RefreshPriority(game, now, ttl):
+  '''
+  Priority to refresh a game: higher with more concurrent users, for recent releases and the longer since the last
+  request.
+  '''
+  priority = math.log10(1 + max(0, int(game.get('peak_ccu', 0) or 0)))
+
+  released = ParseReleaseDate(game.get('release_date', ''))
+  if released is not None:
+    days = (dt.date.fromtimestamp(now) - released).days
+    if days < 90:
+      priority += 3.0
+    elif days < 365:
+      priority += 1.0
+
+  return priority + min(2.0, (now - game.get('fetched', 0)) / ttl)
+
+def Refresh(dataset, notreleased, discarded, args, steam_api_key):
+  '''
+  Request again the games not updated in the last 'refresh' days and the not released ones that are due, by
+  priority.
+  '''
+  now = time.time()
+  ttl = args.refresh * 86400
+  Log(INFO, f'Searching games older than {args.refresh} days')
+
+  candidates = [(REFRESH_NOTRELEASED, appID) for appID, info in notreleased.items() if NextCheck(info) <= now]
+  for appID, game in dataset.items():
+    if now - game.get('fetched', 0) > ttl:
+      candidates.append((RefreshPriority(game, now, ttl), appID))
+
+  candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+  if args.refresh_limit > 0:
+    candidates = candidates[:args.refresh_limit]
+
+  if len(candidates) > 0:
+    Log(INFO, f'{len(candidates)} apps to refresh')
+
+    return Scraper(dataset, notreleased, discarded, args, steam_api_key, [appID for priority, appID in candidates])
+  else:
+    Log(INFO, 'No games to refresh')
+
+  return 0, 0, 0
+
+def LoadData(args, keysOnly=False):
+  '''
+  Load the dataset, the not released list and the discarded apps from the JSON files. With 'keysOnly' only the
+  appIDs of the games are loaded.
+  '''
+  if keysOnly:
+    dataset = GameKeys(args.infile)
+  else:
+    dataset = LoadJSON(args.infile, CompactDataset if args.compact_records else dict)
+  discarded = LoadJSON(DISCARDED_FILE)
+  notreleased = LoadJSON(NOTRELEASED_FILE)
+
+  if dataset is None:
+    dataset = CompactDataset() if args.compact_records else {}
+
+  if discarded is None:
+    discarded = {}
+  elif isinstance(discarded, list):
+    Log(INFO, f'Migrating {len(discarded)} discarded apps to new format')
+    discarded = {appID: {'name': 'Unknown', 'reason': 'legacy'} for appID in discarded}
+
+  if notreleased is None:
+    notreleased = {}
+  elif isinstance(notreleased, list):
+    Log(INFO, f'Migrating {len(notreleased)} not released apps to new format')
+    notreleased = {appID: {} for appID in notreleased}
+
+  return dataset, notreleased, discarded
+
+def ParseShard(text):
+  '''
+  'K/N' to (K, N), K from 1 to N.
+  '''
+  try:
+    shard, count = (int(part) for part in text.split('/'))
+  except ValueError:
+    raise argparse.ArgumentTypeError('Shard expected as K/N, like 1/4.')
+  if not 1 <= shard <= count:
+    raise argparse.ArgumentTypeError('Shard K/N needs K from 1 to N.')
+
+  return shard, count
+
+def ParseAppTypes(text):
+  '''
+  'game,dlc' to ['game', 'dlc'].
+  '''
+  types = [appType.strip() for appType in text.split(',') if appType.strip() != '']
+  for appType in types:
+    if appType not in APP_TYPES:
+      raise argparse.ArgumentTypeError(f"Unknown app type '{appType}', expected one of {', '.join(APP_TYPES)}.")
+
+  return types
+
+def ShardName(filename, shard):
+  '''
+  File name of a shard: 'games.json' to 'games-1-of-4.json'.
+  '''
+  name, ext = os.path.splitext(filename)
+
+  return f'{name}-{shard[0]}-of-{shard[1]}{ext}'
+
+def InShard(appID, shard):
+  '''
+  True if the app belongs to the shard (K, N), or there is no shard. The same in any machine or Python version.
+  '''
+  return shard is None or zlib.crc32(str(appID).encode('utf-8')) % shard[1] == shard[0] - 1
+
 def str2bool(v):
   if isinstance(v, bool):
     return v
@@ -517,18 +1819,53 @@ if __name__ == "__main__":
   parser = argparse.ArgumentParser(description='Steam games scraper.')
   parser.add_argument('-i', '--infile',   type=str,   default=DEFAULT_INFILE,  help='Input file name')
   parser.add_argument('-o', '--outfile',  type=str,   default=DEFAULT_OUTFILE,  help='Output file name')
-  parser.add_argument('-s', '--sleep',    type=float, default=DEFAULT_SLEEP,    help='Waiting time between requests')
+  parser.add_argument('-s', '--sleep',    type=float, default=DEFAULT_SLEEP,    help='Initial waiting time between requests to the same endpoint')
+  parser.add_argument('-m', '--max-rate', type=float, default=DEFAULT_MAX_RATE, help='Maximum requests per second to the same endpoint')
   parser.add_argument('-r', '--retries',  type=int,   default=DEFAULT_RETRIES,  help='Number of retries (0 to always retry)')
   parser.add_argument('-a', '--autosave', type=int,   default=DEFAULT_AUTOSAVE, help='Record the data every number of new entries (0 to deactivate)')
-  parser.add_argument('-d', '--released', type=str2bool, default=True,             help='If it is on the list of not yet released, no information is requested')
+  parser.add_argument('-d', '--released', type=str2bool, default=True,             help='Request the not released apps only when their date has passed or their backoff ends (false to request all of them)')
   parser.add_argument('-c', '--currency', type=str,   default=DEFAULT_CURRENCY, help='Currency code')
   parser.add_argument('-l', '--language', type=str,   default=DEFAULT_LANGUAGE, help='Language code')
+  parser.add_argument('-cs', '--currencies', type=str, default='',              help='Comma separated currency codes, the price of the games in each one is added')
   parser.add_argument('-p', '--steamspy', type=str2bool, default=True,             help='Add SteamSpy info')
+  parser.add_argument('-sb', '--steamspy-bulk', action='store_true',            help='Download the SteamSpy info of all apps in the background, request it per app only for new games')
   parser.add_argument('-u', '--update',   type=str,   default='',               help='Update using APPIDs from a CSV file')
   parser.add_argument('-oa', '--only-applist', action='store_true',             help='Only use the applist file, do not update it from Steam')
+  parser.add_argument('-at', '--app-types', type=ParseAppTypes, default=DEFAULT_APP_TYPES, help=f"Comma separated types of apps added to the applist ({', '.join(APP_TYPES)}), only the games are requested")
+  parser.add_argument('-j', '--journal',  action='store_true',                   help='Append each new entry to a journal instead of autosaving, compact it at exit')
+  parser.add_argument('--compact',        action='store_true',                   help='Compact the journal into the JSON files and exit')
+  parser.add_argument('-b', '--database', type=str,   default='',               help='Store the data in a SQLite database instead of the JSON files')
+  parser.add_argument('-rf', '--refresh', type=float, default=0,               help='Request again the games older than this number of days (0 to deactivate)')
+  parser.add_argument('--refresh-limit',  type=int,   default=DEFAULT_REFRESH_LIMIT, help='Maximum number of apps to refresh (0 for all)')
+  parser.add_argument('--cache',          type=str,   default='',               help='Keep the Steam responses in this cache file')
+  parser.add_argument('--cache-size',     type=int,   default=DEFAULT_CACHE_SIZE, help='Maximum size of the cache in MB')
+  parser.add_argument('--cache-age',      type=float, default=DEFAULT_CACHE_AGE, help='Hours a cached response is used without asking Steam')
+  parser.add_argument('--rebuild',        action='store_true',                   help='Parse again the responses in the cache, without requests')
+  parser.add_argument('-cr', '--compact-records', action='store_true',         help='Keep the games in memory as compact records, sharing the repeated strings')
+  parser.add_argument('-w', '--workers',  type=int,   default=DEFAULT_WORKERS,  help='Number of concurrent requests (0 or 1 to scrape sequentially)')
+  parser.add_argument('-pp', '--parsers', type=int,   default=DEFAULT_PARSERS,  help='Number of processes parsing the responses (0 to parse in the requests)')
+  parser.add_argument('--shard',          type=ParseShard, default=None,         help='Only scrape the apps of the shard K of N (K/N), in their own files')
+  parser.add_argument('--metrics-port',   type=int,   default=0,                help='Serve the metrics in the Prometheus format on this local port (0 to deactivate)')
+  parser.add_argument('--stats-file',     type=str,   default='',               help='Rewrite this JSON file with the metrics periodically')
+  parser.add_argument('--stats-interval', type=float, default=DEFAULT_INTERVAL, help='Seconds between writes of the stats file')
+  parser.add_argument('--profile',        type=str,   nargs='?', const='spans', default=None, choices=PROFILE_MODES,
+                      help='Time the stages (spans), also sampling the stacks (sample) or with cProfile in the CPU-bound ones (cprofile)')
+  parser.add_argument('--profile-output', type=str,   default=DEFAULT_PROFILE,  help='Base name of the profile files')
   args = parser.parse_args()
+  args.currencies = [currency.strip() for currency in args.currencies.split(',') if currency.strip() != '']
   random.seed(time.time())
 
+  if args.shard is not None:
+    Log(INFO, f'Shard {args.shard[0]} of {args.shard[1]}')
+    args.infile = ShardName(args.infile, args.shard)
+    args.outfile = ShardName(args.outfile, args.shard)
+    if args.database != '':
+      args.database = ShardName(args.database, args.shard)
+    APPLIST_FILE = ShardName(APPLIST_FILE, args.shard)
+    DISCARDED_FILE = ShardName(DISCARDED_FILE, args.shard)
+    NOTRELEASED_FILE = ShardName(NOTRELEASED_FILE, args.shard)
+    STEAMSPY_FILE = ShardName(STEAMSPY_FILE, args.shard)
+
   # Get the Steam API key from the .env file
   STEAM_API_KEY = None
   if os.path.exists('.env'):
@@ -546,34 +1883,70 @@ if __name__ == "__main__":
     Log(INFO, 'Create a .env file with the API key. You can get it from https://steamcommunity.com/dev/apikey')
     sys.exit(1)
 
-  dataset = LoadJSON(args.infile)
-  discarded = LoadJSON(DISCARDED_FILE)
-  notreleased = LoadJSON(NOTRELEASED_FILE)
+  if args.database != '':
+    database = GameDatabase(args.database)
+    if database.Empty() and os.path.exists(args.infile):
+      Log(INFO, f"Importing JSON files into '{args.database}'")
+      database.Import(*LoadData(args))
 
-  if dataset is None:
-    dataset = {}
-
-  if discarded is None:
-    discarded = {}
-  elif isinstance(discarded, list):
-    Log(INFO, f'Migrating {len(discarded)} discarded apps to new format')
-    discarded = {appID: {'name': 'Unknown', 'reason': 'legacy'} for appID in discarded}
-
-  if notreleased is None:
-    notreleased = []
+    dataset, notreleased, discarded = database.games, database.notreleased, database.discarded
+  else:
+    # Refreshing needs the stored games.
+    dataset, notreleased, discarded = LoadData(args, (args.journal or args.compact) and args.refresh <= 0)
+
+  if (args.journal or args.compact) and database is None:
+    journal = Journal(os.path.splitext(args.outfile)[0] + JOURNAL_EXT)
+    replayed = journal.Replay(dataset, notreleased, discarded)
+    if replayed > 0:
+      Log(INFO, f'{replayed} entries replayed from the journal')
+
+    if args.compact:
+      journal.Compact(dataset, notreleased, discarded, args.outfile)
+      Log(INFO, 'Done')
+      sys.exit()
 
   Log(INFO, f'Dataset loaded with {len(dataset)} games' if len(dataset) > 0 else 'New dataset created')
 
   if len(notreleased) > 0:
-    Log(INFO, f'{len(notreleased)} games not released yet')
+    now = time.time()
+    due = sum(1 for info in notreleased.values() if NextCheck(info) <= now)
+    Log(INFO, f'{len(notreleased)} games not released yet, {due} due to be checked')
 
   if len(discarded) > 0:
     Log(INFO, f'{len(discarded)} apps discarded')
 
+  if args.steamspy and args.steamspy_bulk:
+    steamspy = SteamSpyCache(STEAMSPY_FILE)
+    steamspy.Start(args.retries)
+
+  if args.cache != '':
+    cache = ResponseCache(args.cache, args.cache_size * 1024 * 1024, args.cache_age * 3600)
+    Log(INFO, f"{len(cache)} responses in the cache '{args.cache}'")
+
+  server = None
+  if args.metrics_port > 0:
+    server = MetricsServer(metrics, args.metrics_port)
+    Log(INFO, f'Metrics in http://127.0.0.1:{server.port}/metrics')
+
+  writer = None
+  if args.stats_file != '':
+    writer = StatsWriter(metrics, args.stats_file, args.stats_interval)
+
+  if args.profile is not None:
+    profiler = Profiler(args.profile)
+    Log(INFO, f"Profiling the stages ({args.profile})")
+
   start_time = time.time()
   try:
     added, not_released, discarded_count = (0, 0, 0)
-    if args.update == '':
+    if args.rebuild:
+      if cache is None:
+        Log(ERROR, 'The cache is required to rebuild (--cache)')
+      else:
+        added, not_released, discarded_count = Rebuild(dataset, notreleased, discarded, args)
+    elif args.refresh > 0:
+      added, not_released, discarded_count = Refresh(dataset, notreleased, discarded, args, STEAM_API_KEY)
+    elif args.update == '':
       added, not_released, discarded_count = Scraper(dataset, notreleased, discarded, args, STEAM_API_KEY)
     else:
       added, not_released, discarded_count = UpdateFromCSV(dataset, notreleased, discarded, args, STEAM_API_KEY)
@@ -595,6 +1968,9 @@ if __name__ == "__main__":
     print(f" New games:       {added} (+{growth:.2f}% growth)")
     print(f" Not released:    {not_released}")
     print(f" Discarded:       {discarded_count}")
+    print(f" Requests:        {metrics.Total('requests_total'):.0f}")
+    for stage in ('sleep', 'fetch', 'parse', 'save'):
+      print(f" {stage.capitalize() + ' time:':<17}{metrics.Value('stage_seconds_total', stage=stage):.1f}s")
     print('-'*50)
     print(f" TOTAL DATABASE STATS")
     print('-'*50)
@@ -603,8 +1979,21 @@ if __name__ == "__main__":
     print(f" Total pending:   {len(notreleased)}")
     print('='*50 + '\n')
 
-  SaveJSON(dataset, args.outfile, args.autosave > 0)
-  SaveJSON(discarded, DISCARDED_FILE, args.autosave > 0)
-  SaveJSON(notreleased, NOTRELEASED_FILE, args.autosave > 0)
+  SaveData(dataset, notreleased, discarded, args, args.autosave > 0)
+  if steamspy is not None:
+    steamspy.Save()
+  if database is not None:
+    database.Close()
+  if cache is not None:
+    cache.Close()
+  if writer is not None:
+    writer.Stop()
+  if server is not None:
+    server.Stop()
+  if profiler is not None:
+    files = profiler.Write(args.profile_output)
+    for line in profiler.Summary():
+      print(' ' + line)
+    Log(INFO, f"Profile written to {', '.join(files)}")
 
   Log(INFO, 'Done')
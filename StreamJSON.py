@@ -0,0 +1,200 @@
+########################################################################################################################
+# Copyright (c) Martin Bustos @FronkonGames <fronkongames@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the "Software"), to deal in the Software without restriction, including without limitation the
+# rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR
+# COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+########################################################################################################################
+__author__    = "Martin Bustos <fronkongames@gmail.com>"
+__copyright__ = "Copyright 2022, Martin Bustos"
+__license__   = "MIT"
+__version__   = "1.0.0"
+__email__     = "fronkongames@gmail.com"
+
+import os
+import re
+import json
+
+CHUNK_SIZE = 1 << 20
+NUMBER_CHARS = '0123456789.eE+-'
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+# With indent=4 the keys of the top-level object are the only lines that start with exactly four spaces and a quote.
+INDENTED   = re.compile(rb'\{\r?\n    "')
+TOP_KEY    = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+
+class ChunkReader:
+  '''
+  Text buffer filled from a file as needed. The consumed part is dropped.
+  '''
+  def __init__(self, fin, chunkSize=CHUNK_SIZE):
+    self.fin = fin
+    self.chunkSize = chunkSize
+    self.buffer = ''
+    self.pos = 0
+    self.eof = False
+
+  def More(self):
+    '''
+    Read another chunk, at least as big as the pending text. Returns False at the end of the file.
+    '''
+    if self.eof:
+      return False
+
+    chunk = self.fin.read(max(self.chunkSize, len(self.buffer) - self.pos))
+    if chunk == '':
+      self.eof = True
+      return False
+
+    self.buffer = self.buffer[self.pos:] + chunk
+    self.pos = 0
+
+    return True
+
+  def Peek(self):
+    '''
+    Next character that is not whitespace, '' at the end of the file.
+    '''
+    while True:
+      self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+      if self.pos < len(self.buffer):
+        return self.buffer[self.pos]
+      if not self.More():
+        return ''
+
+  def Expect(self, chars):
+    char = self.Peek()
+    if char == '' or char not in chars:
+      raise ValueError(f"Expected one of '{chars}' but found '{char}'")
+    self.pos += 1
+
+    return char
+
+  def Decode(self, decoder):
+    '''
+    Decode the next JSON value.
+    '''
+    self.Peek()
+    while True:
+      try:
+        value, end = decoder.raw_decode(self.buffer, self.pos)
+        # A number can be cut by the end of the buffer.
+        if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARS):
+          self.pos = end
+          return value
+      except json.JSONDecodeError:
+        if self.eof:
+          raise
+
+      self.More()
+
+def IterJSON(filename, keysOnly=False, chunkSize=CHUNK_SIZE):
+  '''
+  Yields the (key, value) pairs of the top-level object of a JSON file, reading it in chunks. With 'keysOnly' the
+  values are decoded and dropped, and only the keys are yielded.
+  '''
+  decoder = json.JSONDecoder()
+  with open(filename, 'r', encoding='utf-8') as fin:
+    reader = ChunkReader(fin, chunkSize)
+    if reader.Peek() == '':
+      return
+
+    reader.Expect('{')
+    if reader.Peek() == '}':
+      return
+
+    while True:
+      key = reader.Decode(decoder)
+      reader.Expect(':')
+      if keysOnly:
+        reader.Decode(decoder)
+        yield key
+      else:
+        yield key, reader.Decode(decoder)
+
+      if reader.Expect(',}') == '}':
+        return
+
+def IterKeys(filename, chunkSize=CHUNK_SIZE):
+  '''
+  Yields the keys of the top-level object of a JSON file. Files written with indent=4, like SaveJSON does, are
+  scanned line by line without decoding the values.
+  '''
+  with open(filename, 'rb') as fin:
+    if INDENTED.match(fin.read(8)) is None:
+      yield from IterJSON(filename, True, chunkSize)
+      return
+
+    fin.seek(0)
+    pending = b''
+    while True:
+      chunk = fin.read(chunkSize)
+      text = pending + chunk
+      # Only complete lines are scanned. The last newline is kept for the next chunk.
+      end = len(text) if chunk == b'' else max(text.rfind(b'\n'), 0)
+      pos = text.find(b'\n    "', 0, end)
+      while pos != -1:
+        match = TOP_KEY.match(text, pos + 5, end)
+        yield json.loads(match.group())
+        pos = text.find(b'\n    "', match.end(), end)
+
+      if chunk == b'':
+        return
+      pending = text[end:]
+
+def IterRaw(filename, chunkSize=CHUNK_SIZE):
+  '''
+  Yields the keys and the text of the values, in bytes, of the top-level object of a JSON file, to decode the values
+  somewhere else. Files written with indent=4 are split line by line without decoding them.
+  '''
+  with open(filename, 'rb') as fin:
+    if INDENTED.match(fin.read(8)) is None:
+      for key, value in IterJSON(filename, False, chunkSize):
+        yield key, json.dumps(value, ensure_ascii=False).encode('utf-8')
+      return
+
+    fin.seek(0)
+    text = b''
+    key = None
+    start = 0
+    while True:
+      chunk = fin.read(chunkSize)
+      text += chunk
+      pos = text.find(b'\n    "', start)
+      while pos != -1:
+        match = TOP_KEY.match(text, pos + 5)
+        colon = text.find(b':', match.end()) if match is not None else -1
+        # The line of the key can be cut by the end of the chunk.
+        if colon == -1:
+          break
+
+        if key is not None:
+          # Without the comma before the next key.
+          yield key, text[start:pos].strip()[:-1]
+        key = json.loads(match.group())
+        start = colon + 1
+        pos = text.find(b'\n    "', start)
+
+      if chunk == b'':
+        if key is not None:
+          # Without the brace that closes the object.
+          yield key, text[start:].strip()[:-1].strip()
+        return
+
+      if key is not None:
+        text = text[start:]
+        start = 0
+
+def LoadKeys(filename):
+  '''
+  Set with the keys of the top-level object of a JSON file.
+  '''
+  return set(IterKeys(filename)) if os.path.exists(filename) else set()
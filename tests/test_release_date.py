@@ -0,0 +1,30 @@
+import datetime as dt
+
+import pytest
+
+from ReleaseDate import ParseReleaseDate
+
+@pytest.mark.parametrize('text, date', [
+  ('Oct 21, 2008', dt.date(2008, 10, 21)),
+  ('21 Oct, 2008', dt.date(2008, 10, 21)),
+  ('21 Oct 2008', dt.date(2008, 10, 21)),
+  ('Sep 5, 2024', dt.date(2024, 9, 5)),
+  ('Sept 5, 2024', dt.date(2024, 9, 5)),
+  ('5 Sept. 2024', dt.date(2024, 9, 5)),
+  ('September 5, 2024', dt.date(2024, 9, 5)),
+  ('5 September, 2024', dt.date(2024, 9, 5)),
+  ('5 September 2024', dt.date(2024, 9, 5)),
+  ('September 2024', dt.date(2024, 9, 1)),
+  ('Sept 2024', dt.date(2024, 9, 1)),
+  ('Jan 2025', dt.date(2025, 1, 1)),
+  ('February 3, 2021', dt.date(2021, 2, 3)),
+  ('Q4 2024', dt.date(2024, 10, 1)),
+  ('2024', dt.date(2024, 1, 1)),
+  (' Mar 7, 2019 ', dt.date(2019, 3, 7)),
+])
+def test_parse_release_date(text, date):
+  assert ParseReleaseDate(text) == date
+
+@pytest.mark.parametrize('text', ['', 'Coming soon', 'To be announced', 'Q5 2024'])
+def test_unknown_release_date(text):
+  assert ParseReleaseDate(text) is None
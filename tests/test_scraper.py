@@ -0,0 +1,140 @@
+import json
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+import SteamGamesScraper as scraper
+
+APPS = [str(appID) for appID in range(1, 31)]
+THROTTLED = '3'
+
+def AppDetails(appID):
+  '''
+  appdetails response of the stub: multiples of 5 fail, of 7 are DLC and of 11 are not released yet.
+  '''
+  number = int(appID)
+  if number % 5 == 0:
+    return {appID: {'success': False}}
+
+  comingSoon = number % 11 == 0
+  return {appID: {'success': True, 'data': {
+    'type': 'dlc' if number % 7 == 0 else 'game', 'name': f'Game {number}', 'is_free': number % 2 == 0,
+    'required_age': 0, 'price_overview': {'initial': 1999, 'final': 999, 'discount_percent': 50, 'final_formatted': '$9.99'},
+    'release_date': {'coming_soon': comingSoon, 'date': 'Jan 1, 2030' if comingSoon else 'Jan 1, 2020'},
+    'detailed_description': '<p>Hello <b>world</b></p>', 'about_the_game': 'About', 'short_description': 'Short',
+    'platforms': {'windows': True, 'mac': False, 'linux': number % 3 == 0}, 'developers': [f'Dev {number}'],
+    'publishers': ['Pub'], 'genres': [{'description': 'Indie'}], 'categories': [{'description': 'Single-player'}],
+    'supported_languages': 'English'}}}
+
+def SteamSpy(appID):
+  return {'appid': int(appID), 'developer': 'Dev', 'userscore': 0, 'score_rank': '', 'positive': int(appID), 'negative': 1,
+          'owners': '0 .. 20,000', 'average_forever': 1, 'average_2weeks': 2, 'median_forever': 3, 'median_2weeks': 4,
+          'discount': '0', 'ccu': 7, 'tags': {'Indie': 5}}
+
+class StubHandler(BaseHTTPRequestHandler):
+  '''
+  Steam and SteamSpy. The first request of THROTTLED is answered with 429.
+  '''
+  def log_message(self, *args):
+    pass
+
+  def do_GET(self):
+    url = urlparse(self.path)
+    query = {key: values[0] for key, values in parse_qs(url.query).items()}
+    with self.server.lock:
+      self.server.requests.append((url.path, query))
+      throttle = url.path == '/api/appdetails/' and query['appids'] == THROTTLED and not self.server.throttled
+      if throttle:
+        self.server.throttled = True
+
+    if throttle:
+      self.send_response(429)
+      self.send_header('Retry-After', '0')
+      self.end_headers()
+      return
+
+    if url.path == '/api/appdetails/':
+      body = AppDetails(query['appids'])
+    elif url.path == '/api.php':
+      body = SteamSpy(query['appid'])
+    else:
+      self.send_response(404)
+      self.end_headers()
+      return
+
+    data = json.dumps(body).encode('utf-8')
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+@pytest.fixture
+def stub(monkeypatch, tmp_path):
+  server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+  server.lock = threading.Lock()
+  server.requests = []
+  server.throttled = False
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+
+  base = f'http://127.0.0.1:{server.server_port}'
+  monkeypatch.setattr(scraper, 'STEAM_APPDETAILS_URL', base + '/api/appdetails/')
+  monkeypatch.setattr(scraper, 'STEAMSPY_API_URL', base + '/api.php')
+  monkeypatch.setattr(scraper, 'rates', scraper.RateController(1000, 1000))
+  monkeypatch.chdir(tmp_path)
+  yield server
+  server.shutdown()
+  server.server_close()
+
+def Arguments(workers):
+  return argparse.Namespace(sleep=0.001, max_rate=1000, retries=4, autosave=0, released=True, currency='us',
+                            language='en', currencies=[], steamspy=True, outfile='games.json', workers=workers,
+                            parsers=0, journal=False, refresh=0, shard=None)
+
+def Scrape(workers):
+  dataset, notreleased, discarded = {}, {}, {}
+  scraper.Scraper(dataset, notreleased, discarded, Arguments(workers), 'key', list(APPS))
+  for game in dataset.values():
+    del game['fetched']
+  for info in notreleased.values():
+    del info['checked']
+
+  return dataset, notreleased, discarded
+
+@pytest.mark.parametrize('workers', [0, 4])
+def test_scraper_stores_the_results(stub, workers):
+  dataset, notreleased, discarded = Scrape(workers)
+
+  games = [appID for appID in APPS if int(appID) % 5 != 0 and int(appID) % 7 != 0 and int(appID) % 11 != 0]
+  assert sorted(dataset, key=int) == games
+  assert sorted(notreleased, key=int) == ['11', '22']
+  assert notreleased['22']['release'] == '2030-01-01'
+  assert {appID: info['reason'] for appID, info in discarded.items()} == {
+    **{appID: 'no_success' for appID in ('5', '10', '15', '20', '25', '30')}, '7': 'dlc', '14': 'dlc', '21': 'dlc', '28': 'dlc'}
+
+  assert dataset['4']['name'] == 'Game 4'
+  assert dataset['4']['positive'] == 4
+  assert dataset['4']['tags'] == {'Indie': 5}
+  assert json.load(open('games.json', encoding='utf-8')).keys() == dataset.keys()
+
+def test_scraper_retries_after_429(stub):
+  dataset, notreleased, discarded = Scrape(4)
+
+  assert THROTTLED in dataset
+  requests = [query['appids'] for path, query in stub.requests if path == '/api/appdetails/']
+  assert requests.count(THROTTLED) == 2
+  assert scraper.rates.Bucket('steam').rate < 1000
+
+def test_concurrent_and_sequential_results_are_the_same(stub):
+  sequential = Scrape(0)
+  stub.throttled = False
+  assert Scrape(4) == sequential
+
+def test_client_errors_do_not_lower_the_rate(stub):
+  url = f'http://127.0.0.1:{stub.server_port}/missing'
+  assert scraper.DoRequest(url, retries=4, endpoint='missing') is None
+  assert len(stub.requests) == 1
+  assert scraper.rates.Bucket('missing').rate == 1000